@@ -1,12 +1,19 @@
-try:
-    # importlib.metadata is present in Python 3.8 and later
-    import importlib.metadata as importlib_metadata
-except ImportError:
-    # use the shim package importlib-metadata pre-3.8
-    import importlib_metadata as importlib_metadata
+def __getattr__(name: str) -> str:
+    # the version is looked up when it's first used, since importing
+    # importlib.metadata is slow enough to matter for shell completion
+    if name != "__version__":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        # importlib.metadata is present in Python 3.8 and later
+        import importlib.metadata as importlib_metadata
+    except ImportError:
+        # use the shim package importlib-metadata pre-3.8
+        import importlib_metadata as importlib_metadata
 
-try:
-    # __package__ allows for the case where __name__ is "__main__"
-    __version__ = importlib_metadata.version(__package__ or __name__)
-except importlib_metadata.PackageNotFoundError:
-    __version__ = "0.0.0"
+    try:
+        # __package__ allows for the case where __name__ is "__main__"
+        version = importlib_metadata.version(__package__ or __name__)
+    except importlib_metadata.PackageNotFoundError:
+        version = "0.0.0"
+    globals()["__version__"] = version
+    return version
@@ -1,3 +1,11 @@
-from .cli import cli
+from .completion import COMPLETE_VAR, complete_from_cache
 
-cli()
+def main() -> None:
+    # completing a target name doesn't need the rest of the CLI
+    if complete_from_cache():
+        return
+    from .cli import cli
+    cli(complete_var=COMPLETE_VAR)
+
+if __name__ == "__main__":
+    main()
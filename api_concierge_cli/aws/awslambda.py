@@ -1,238 +1,548 @@
+import dataclasses
+import importlib.util
 import itertools
-import json
-from typing import Callable, Iterable, Mapping, Sequence, Type, Union, Any, Optional
+import os
+import queue
+import threading
+import time
+import weakref
+from typing import Callable, Iterable, List, Mapping, Sequence, Tuple, Type, Union, Any, Optional, TYPE_CHECKING
+from urllib.parse import urlsplit
 
 from ..types import (
     InvocationRequest,
     SchemaRequest,
     SchemaResponse,
     ErrorResponse,
+    InvalidSchemaResponseError,
+    load_invocation_response,
 )
 
-from ..platform import RequestError, Target, Platform
+from .. import codec, cache
+from ..schema_store import SchemaStore
+from . import credential_cache
+from .config import get_cache_key, get_configured_region
+from ..platform import (
+    RequestError,
+    TransientRequestError,
+    ThrottlingError,
+    ConnectionFailedError,
+    RequestPolicy,
+    RequestRecord,
+    Target,
+    AsyncTarget,
+    Platform,
+)
 
 import click
 
-try:
+if TYPE_CHECKING:
+    import boto3
+    from .awslambda_async import AsyncLambdaTransport
+
+# boto3 is imported when it's used, so the CLI starts quickly (e.g., for shell completion)
+
+THROTTLING_ERROR_CODES = {
+    "TooManyRequestsException",
+    "ThrottlingException",
+    "Throttling",
+    "RequestLimitExceeded",
+}
+
+_CLIENTS = weakref.WeakKeyDictionary()
+_CLIENTS_LOCK = threading.Lock()
+
+_ASYNC_TRANSPORTS = weakref.WeakKeyDictionary()
+
+def _create_session(profile: Optional[str]) -> "boto3.Session":
     import boto3
+    session = boto3.Session(profile_name=profile)
+    # reuse temporary credentials across runs, rather than assuming roles every time
+    if not os.environ.get(credential_cache.NO_CREDENTIAL_CACHE_ENV_VAR):
+        credential_cache.install(session)
+    return session
+
+def _get_lambda_client(session: "boto3.Session", connect_timeout: float, read_timeout: float):
+    # clients are cached per session and timeouts, as creating one is
+    # expensive and discovered targets share a session
+    # retries are handled by the request policy rather than botocore
+    with _CLIENTS_LOCK:
+        clients = _CLIENTS.setdefault(session, {})
+        key = (connect_timeout, read_timeout)
+        if key not in clients:
+            import botocore.config
+            config = botocore.config.Config(
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                retries={"total_max_attempts": 1},
+            )
+            clients[key] = session.client("lambda", config=config)
+        return clients[key]
+
+def _get_async_transport(session: "boto3.Session", lambda_client: Any) -> "AsyncLambdaTransport":
+    from .awslambda_async import AsyncLambdaTransport
+    with _CLIENTS_LOCK:
+        if session not in _ASYNC_TRANSPORTS:
+            _ASYNC_TRANSPORTS[session] = AsyncLambdaTransport(
+                session, lambda_client.meta.endpoint_url, lambda_client.meta.region_name,
+                ca_bundle=session._session.get_config_variable("ca_bundle"),
+            )
+        return _ASYNC_TRANSPORTS[session]
+
+def _uses_proxy(lambda_client: Any) -> bool:
+    import urllib.request
+    if lambda_client.meta.config.proxies:
+        return True
+    url = urlsplit(lambda_client.meta.endpoint_url)
+    return url.scheme in urllib.request.getproxies() and not urllib.request.proxy_bypass(url.hostname)
+
+def _get_function_error(function_error: str, response_payload: Any) -> RequestError:
+    message = f"Error {function_error}"
+    try:
+        message += f" {response_payload['errorType']}: {response_payload['errorMessage']}"
+    except:
+        pass
+    return RequestError(message)
+
+class _Round:
+    """Timing of one round of attempts, shared by the sync and async targets:
+    how long to wait for a result, and whether to hedge when a wait runs out."""
+
+    def __init__(self, timeout: Optional[float], hedge_after: Optional[float]) -> None:
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.start = time.monotonic()
+        self.sent = 1
+
+    def _remaining(self) -> Optional[float]:
+        return None if self.timeout is None else max(0, self.timeout - (time.monotonic() - self.start))
 
-    class LambdaTarget(Target):
-        def __init__(
-            self,
-            *,
-            session: boto3.Session,
-            function_arn: str,
-            description: Optional[str] = None,
-            schema_arn: Optional[str] = None,
-            schema_search: Optional[bool] = None
-        ) -> None:
-            self.session = session
-            self.lambda_client = session.client("lambda")
-            self.arn = function_arn
-            self._description = description
-            self.schema_arn = schema_arn
-            self.schema_search = schema_search
-
-        def get_name(self) -> str:
-            return self.arn.split(":", 6)[-1]
-
-        def get_description(self) -> Optional[str]:
-            return self._description
-
-        def search_for_schema(self) -> Optional[SchemaResponse]:
-            #TODO: check Parameter Store
-            #TODO: check tags
-            #TODO: check env var
-            return None
-
-        def request_schema(self, request: SchemaRequest) -> SchemaResponse:
-            if self.schema_arn:
-                raise NotImplementedError
-            if self.schema_search:
-                raise NotImplementedError
-            response = self.lambda_client.invoke(
-                FunctionName=self.arn, Payload=json.dumps(request.get_payload())
+    def get_wait(self) -> Optional[float]:
+        wait = self._remaining()
+        if self.hedge_after is not None and self.sent == 1:
+            wait = self.hedge_after if wait is None else min(wait, self.hedge_after)
+        return wait
+
+    def hedge(self) -> bool:
+        """After a wait ran out, whether to send a second attempt; if not,
+        the deadline has passed."""
+        if self.hedge_after is None or self.sent != 1 or self._remaining() == 0:
+            return False
+        self.sent += 1
+        return True
+
+def _get_request_record(phase: str, start: float, sent: int, index: int, round_sent: int) -> RequestRecord:
+    return RequestRecord(
+        phase=phase,
+        attempts=sent + round_sent,
+        winner=sent + index,
+        hedged=index == 2,
+        latency=time.monotonic() - start,
+    )
+
+class LambdaTarget(Target):
+    def __init__(
+        self,
+        *,
+        session: "boto3.Session",
+        function_arn: str,
+        description: Optional[str] = None,
+        schema_arn: Optional[str] = None,
+        schema_search: Optional[bool] = None,
+        policy: Optional[RequestPolicy] = None,
+        schema_store: Optional[SchemaStore] = None,
+        lambda_client: Optional[Any] = None
+    ) -> None:
+        self.session = session
+        self._lambda_client = lambda_client
+        self.arn = function_arn
+        self._description = description
+        self.schema_arn = schema_arn
+        self.schema_search = schema_search
+        self.policy = policy or RequestPolicy()
+        self.schema_store = schema_store
+        self._last_request_record = None
+
+    @property
+    def lambda_client(self):
+        return self._get_client(self.policy.invoke_timeout)
+
+    def _get_client(self, read_timeout: float):
+        if self._lambda_client:
+            return self._lambda_client
+        return _get_lambda_client(self.session, self.policy.connect_timeout, read_timeout)
+
+    def get_name(self) -> str:
+        return self.arn.split(":", 6)[-1]
+
+    def get_description(self) -> Optional[str]:
+        return self._description
+
+    def get_last_request_record(self) -> Optional[RequestRecord]:
+        return self._last_request_record
+
+    def search_for_schema(self) -> Optional[SchemaResponse]:
+        #TODO: check Parameter Store
+        #TODO: check tags
+        #TODO: check env var
+        return None
+
+    def _invoke_function(self, payload: bytes, client: Any) -> Any:
+        import botocore.exceptions
+        try:
+            response = client.invoke(
+                FunctionName=self.arn, Payload=payload
             )
-            response_payload = json.load(response["Payload"])
-            if "FunctionError" in response:
-                message = f"Error {response['FunctionError']}"
+        except botocore.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+                raise ThrottlingError(str(e)) from e
+            # botocore's retries are off, so server errors are retried by the policy
+            if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) >= 500:
+                raise TransientRequestError(str(e)) from e
+            raise RequestError(str(e)) from e
+        except botocore.exceptions.ConnectionError as e:
+            raise ConnectionFailedError(str(e)) from e
+        except botocore.exceptions.HTTPClientError as e:
+            raise TransientRequestError(str(e)) from e
+        response_payload = codec.load(response["Payload"])
+        if "FunctionError" in response:
+            raise _get_function_error(response["FunctionError"], response_payload)
+        return response_payload
+
+    def _invoke_function_within(self, payload: bytes, client: Any, timeout: Optional[float],
+            hedge_after: Optional[float]) -> Tuple[Any, Optional[Exception], int, int]:
+        """Returns the response payload or the error, which attempt it came
+        from, and how many attempts were sent."""
+        # attempts run on daemon threads so an abandoned attempt can't hold up exit
+        results = queue.Queue()
+        def attempt(index):
+            try:
+                results.put((index, self._invoke_function(payload, client), None))
+            except Exception as e:
+                results.put((index, None, e))
+
+        timing = _Round(timeout, hedge_after)
+        threading.Thread(target=attempt, args=(1,), daemon=True).start()
+        pending = 1
+        error = None
+        while pending:
+            try:
+                index, response_payload, error = results.get(timeout=timing.get_wait())
+            except queue.Empty:
+                if timing.hedge():
+                    threading.Thread(target=attempt, args=(2,), daemon=True).start()
+                    pending += 1
+                    continue
+                return None, TransientRequestError("Deadline exceeded"), 0, timing.sent
+            pending -= 1
+            if not error:
+                return response_payload, None, index, timing.sent
+        return None, error, index, timing.sent
+
+    def _request(self, phase: str, payload: bytes, *, read_timeout: float, deadline: Optional[float],
+            hedge: bool, retryable: Tuple[Type[Exception], ...]) -> Any:
+        client = self._get_client(read_timeout)
+        start = time.monotonic()
+        sent = 0
+        for attempt in itertools.count(1):
+            remaining = None if deadline is None else deadline - (time.monotonic() - start)
+            if hedge or deadline is not None:
+                response_payload, error, index, round_sent = self._invoke_function_within(
+                    payload, client, remaining, self.policy.hedge_after if hedge else None)
+            else:
+                response_payload, error, index, round_sent = None, None, 1, 1
                 try:
-                    message += f" {response_payload['errorType']}: {response_payload['errorMessage']}"
-                except:
-                    pass
-                raise RequestError(message)
-            return SchemaResponse.load_from_payload(response_payload)
-
-        def invoke(
-            self, request: InvocationRequest
-        ) -> Union[SchemaResponse, ErrorResponse, Any]:
-            response = self.lambda_client.invoke(
-                FunctionName=self.arn, Payload=json.dumps(request.get_payload())
+                    response_payload = self._invoke_function(payload, client)
+                except RequestError as e:
+                    error = e
+            if error is None:
+                self._last_request_record = _get_request_record(phase, start, sent, index, round_sent)
+                return response_payload
+            sent += round_sent
+            delay = self.policy.get_retry_delay(error, attempt, time.monotonic() - start, deadline, retryable)
+            if delay is None:
+                raise error
+            time.sleep(delay)
+
+    def _check_schema_source(self) -> None:
+        if self.schema_arn:
+            raise NotImplementedError
+        if self.schema_search:
+            raise NotImplementedError
+
+    def request_schema(self, request: SchemaRequest) -> SchemaResponse:
+        self._check_schema_source()
+        if not self.schema_store:
+            return self._request_schema(request)
+        return self.schema_store.request(self.arn, request, self._request_schema)
+
+    def _get_schema_request_options(self) -> Mapping[str, Any]:
+        return dict(
+            read_timeout=self.policy.schema_timeout,
+            deadline=self.policy.schema_deadline,
+            hedge=self.policy.hedge_after is not None,
+            retryable=(TransientRequestError,),
+        )
+
+    def _get_invoke_request_options(self) -> Mapping[str, Any]:
+        # invocations aren't idempotent, so only retry errors where the
+        # function wasn't run
+        return dict(
+            read_timeout=self.policy.invoke_timeout,
+            deadline=self.policy.invoke_deadline,
+            hedge=False,
+            retryable=(ConnectionFailedError, ThrottlingError),
+        )
+
+    def _request_schema(self, request: SchemaRequest) -> SchemaResponse:
+        response_payload = self._request("schema", request.get_payload_bytes(), **self._get_schema_request_options())
+        return SchemaResponse.load_from_payload(response_payload)
+
+    def invoke(
+        self, request: InvocationRequest
+    ) -> Union[SchemaResponse, ErrorResponse, Any]:
+        response_payload = self._request("invoke", request.get_payload_bytes(), **self._get_invoke_request_options())
+        return load_invocation_response(response_payload)
+
+    def invoke_request_to_str(self, request: InvocationRequest, json_dump_func: Callable[[Any], str]) -> str:
+        return json_dump_func(request.get_payload())
+
+    def invoke_response_to_str(self, response: Any, json_dump_func: Callable[[Any], str]) -> str:
+        return json_dump_func(response)
+
+    def as_async(self) -> AsyncTarget:
+        lambda_client = self.lambda_client
+        if _uses_proxy(lambda_client):
+            # the async transport connects directly, so go through boto3 on threads
+            return super().as_async()
+        from .awslambda_async import AsyncLambdaTarget
+        return AsyncLambdaTarget(self, _get_async_transport(self.session, lambda_client))
+
+
+class LambdaPlatform(Platform):
+    TAG_KEY = "api-concierge"
+
+    @classmethod
+    def get_name(cls) -> str:
+        return "lambda"
+
+    @classmethod
+    def get_list_command(cls, handler: Callable[[Iterable[Target], Mapping], None]) -> click.Command:
+        @click.command()
+        @click.option("--profile", metavar="PROFILE")
+        @click.option("--tags/--no-tags", default=None)
+        @click.option("--env/--no-env", default=None)
+        @click.option("--ssm/--no-ssm", default=None)
+        @cls._request_policy_options(invoke=False)
+        def command(profile, tags, env, ssm, **kwargs):
+            if not kwargs.get("with_schema") and any(kwargs.get(name) for name in cls._REQUEST_POLICY_OPTIONS):
+                raise click.UsageError("Request options require --with-schema")
+            session = _create_session(profile)
+            schema_store = SchemaStore()
+            # listed targets are only requested by the sweep, which handles
+            # throttling itself by lowering its concurrency
+            policy = dataclasses.replace(cls._get_request_policy(kwargs), retry_throttling=False)
+            iters = []
+            already_returned = set()
+            if tags is None and env is None and ssm is None:
+                iters = [
+                    cls._iter_tags(session, already_returned, schema_store, policy),
+                    cls._iter_env(session, already_returned, schema_store, policy),
+                    cls._iter_ssm(session, already_returned, schema_store, policy),
+                ]
+            else:
+                if tags:
+                    iters.append(cls._iter_tags(session, already_returned, schema_store, policy))
+                if env:
+                    iters.append(cls._iter_env(session, already_returned, schema_store, policy))
+                if ssm:
+                    iters.append(cls._iter_ssm(session, already_returned, schema_store, policy))
+            targets = itertools.chain(*iters)
+            if tags is None and env is None and ssm is None:
+                targets = cache.caching_targets(
+                    cls.get_name(), cls._get_cache_key(profile, session.region_name), targets)
+            handler(targets, kwargs)
+
+        return command
+
+    @classmethod
+    def get_invoke_command(cls, handler: Callable[[Type["Platform"], Target, Mapping], None]) -> click.Command:
+        @click.command()
+        @click.argument("function", shell_complete=cls._get_function_completer())
+        @click.option("--profile", metavar="PROFILE")
+        @click.option("--schema-search", is_flag=True)
+        @click.option("--schema-arn", metavar="ARN")
+        @cls._request_policy_options(invoke=True)
+        def command(function, profile, schema_search, schema_arn, **kwargs):
+            if schema_search and schema_arn:
+                raise click.UsageError("Cannot use --schema-search and --schema-arn")
+            session = _create_session(profile)
+            if not function.startswith("arn:"):
+                account = session.client("sts").get_caller_identity()["Account"]
+                function = f"arn:aws:lambda:{session.region_name}:{account}:function:{function}"
+            target = LambdaTarget(
+                session=session, function_arn=function, schema_search=schema_search, schema_arn=schema_arn,
+                policy=cls._get_request_policy(kwargs), schema_store=SchemaStore()
             )
-            response_payload = json.load(response["Payload"])
-            if "FunctionError" in response:
-                message = f"Error {response['FunctionError']}"
+            handler(cls, target, kwargs)
+
+        return command
+
+    @classmethod
+    def get_get_schema_command(cls, handler: Callable[[Type["Platform"], Target, Mapping], None]) -> click.Command:
+        @click.command()
+        @click.argument("function", shell_complete=cls._get_function_completer())
+        @click.option("--profile", metavar="PROFILE")
+        @cls._request_policy_options(invoke=False)
+        def command(function, profile, **kwargs):
+            session = _create_session(profile)
+            if not function.startswith("arn:"):
+                account = session.client("sts").get_caller_identity()["Account"]
+                function = f"arn:aws:lambda:{session.region_name}:{account}:function:{function}"
+            target = LambdaTarget(
+                session=session, function_arn=function, policy=cls._get_request_policy(kwargs),
+                schema_store=SchemaStore()
+            )
+            handler(cls, target, kwargs)
+
+        return command
+
+    @classmethod
+    def _get_cache_key(cls, profile: Optional[str], region: Optional[str]) -> str:
+        return get_cache_key(profile, region)
+
+    @classmethod
+    def _get_configured_region(cls, profile: Optional[str]) -> Optional[str]:
+        return get_configured_region(profile)
+
+    @classmethod
+    def _get_function_completer(cls):
+        def get_key(ctx: click.Context) -> str:
+            profile = ctx.params.get("profile")
+            return cls._get_cache_key(profile, cls._get_configured_region(profile))
+        def get_refresh_args(ctx: click.Context) -> List[str]:
+            profile = ctx.params.get("profile")
+            return ["--profile", profile] if profile else []
+        return cache.get_target_completer(cls.get_name(), get_key, get_refresh_args)
+
+    _REQUEST_POLICY_OPTIONS = [
+        "connect_timeout",
+        "schema_timeout",
+        "invoke_timeout",
+        "schema_deadline",
+        "invoke_deadline",
+        "max_attempts",
+        "hedge_after",
+    ]
+
+    @classmethod
+    def _request_policy_options(cls, invoke: bool):
+        seconds = click.FloatRange(min=0, min_open=True)
+        options = [
+            click.option("--connect-timeout", type=seconds, metavar="SECONDS"),
+            click.option("--schema-timeout", type=seconds, metavar="SECONDS",
+                help="Read timeout for each schema request attempt."),
+            click.option("--schema-deadline", type=seconds, metavar="SECONDS",
+                help="Overall deadline for the schema request, including retries."),
+            click.option("--max-attempts", type=click.IntRange(min=1), metavar="N",
+                help="Maximum attempts per request."),
+            click.option("--hedge-after", type=seconds, metavar="SECONDS",
+                help="Send a second schema request if the first hasn't answered in time."),
+        ]
+        if invoke:
+            options.extend([
+                click.option("--invoke-timeout", type=seconds, metavar="SECONDS",
+                    help="Read timeout for each invocation attempt."),
+                click.option("--invoke-deadline", type=seconds, metavar="SECONDS",
+                    help="Overall deadline for each invocation, including retries."),
+            ])
+        def decorator(f):
+            for option in reversed(options):
+                f = option(f)
+            return f
+        return decorator
+
+    @classmethod
+    def _get_request_policy(cls, kwargs: dict) -> RequestPolicy:
+        policy_kwargs = {}
+        for name in cls._REQUEST_POLICY_OPTIONS:
+            value = kwargs.pop(name, None)
+            if value is not None:
+                policy_kwargs[name] = value
+        return RequestPolicy(**policy_kwargs)
+
+    @classmethod
+    def _iter_tags(cls, session: "boto3.Session", already_returned: set, schema_store: SchemaStore,
+            policy: RequestPolicy):
+        resource_client = session.client("resourcegroupstaggingapi")
+        paginator = resource_client.get_paginator("get_resources")
+
+        tag_filters = []
+        tag_filters.append({"Key": cls.TAG_KEY})
+
+        args = {"TagFilters": tag_filters, "ResourceTypeFilters": ["lambda:function"]}
+
+        class Skip(Exception):
+            pass
+
+        for response in paginator.paginate(**args):
+            for resource in response["ResourceTagMappingList"]:
+                function_arn = resource["ResourceARN"]
+                if function_arn in already_returned:
+                    continue
+                already_returned.add(function_arn)
+                try:
+                    description = None
+                    for tag in resource["Tags"]:
+                        if tag["Key"] == cls.TAG_KEY:
+                            value = tag["Value"]
+                            if value.lower() == "false":
+                                raise Skip
+                            if value.lower() != "true":
+                                description = value
+                            break
+                    yield LambdaTarget(
+                        session=session, function_arn=function_arn, description=description,
+                        schema_store=schema_store, policy=policy
+                    )
+                except Skip:
+                    continue
+
+    @classmethod
+    def _iter_env(cls, session: "boto3.Session", already_returned: set, schema_store: SchemaStore,
+            policy: RequestPolicy):
+        lambda_client = session.client("lambda")
+        paginator = lambda_client.get_paginator("list_functions")
+        class Skip(Exception):
+            pass
+        for response in paginator.paginate():
+            for function in response.get("Functions", []):
+                function_arn = function["FunctionArn"]
+                if function_arn in already_returned:
+                    continue
+                already_returned.add(function_arn)
                 try:
-                    message += f" {response_payload['errorType']}: {response_payload['errorMessage']}"
-                except:
-                    pass
-                raise RequestError(message)
-            if SchemaResponse.is_schema_response(response_payload):
-                return SchemaResponse.load_from_payload(response_payload)
-            if ErrorResponse.is_error_response(response_payload):
-                return ErrorResponse.load_from_payload(response_payload)
-            return response_payload
-
-        def invoke_request_to_str(self, request: InvocationRequest, json_dump_func: Callable[[Any], str]) -> str:
-            return json_dump_func(request.get_payload())
-
-        def invoke_response_to_str(self, response: Any, json_dump_func: Callable[[Any], str]) -> str:
-            return json_dump_func(response)
-
-
-    class LambdaPlatform(Platform):
-        TAG_KEY = "api-concierge"
-
-        @classmethod
-        def get_name(cls) -> str:
-            return "lambda"
-
-        @classmethod
-        def get_list_command(cls, handler: Callable[[Iterable[Target], Mapping], None]) -> click.Command:
-            @click.command()
-            @click.option("--profile", metavar="PROFILE")
-            @click.option("--tags/--no-tags", default=None)
-            @click.option("--env/--no-env", default=None)
-            @click.option("--ssm/--no-ssm", default=None)
-            def command(profile, tags, env, ssm, **kwargs):
-                session = boto3.Session(profile_name=profile)
-                iters = []
-                already_returned = set()
-                if tags is None and env is None and ssm is None:
-                    iters = [
-                        cls._iter_tags(session, already_returned),
-                        cls._iter_env(session, already_returned),
-                        cls._iter_ssm(session, already_returned),
-                    ]
-                else:
-                    if tags:
-                        iters.append(cls._iter_tags(session, already_returned))
-                    if env:
-                        iters.append(cls._iter_env(session, already_returned))
-                    if ssm:
-                        iters.append(cls._iter_ssm(session, already_returned))
-                handler(itertools.chain(*iters), kwargs)
-
-            return command
-
-        @classmethod
-        def get_invoke_command(cls, handler: Callable[[Type["Platform"], Target, Mapping], None]) -> click.Command:
-            @click.command()
-            @click.argument("function")
-            @click.option("--profile", metavar="PROFILE")
-            @click.option("--schema-search", is_flag=True)
-            @click.option("--schema-arn", metavar="ARN")
-            def command(function, profile, schema_search, schema_arn, **kwargs):
-                if schema_search and schema_arn:
-                    raise click.UsageError("Cannot use --schema-search and --schema-arn")
-                session = boto3.Session(profile_name=profile)
-                if not function.startswith("arn:"):
-                    account = session.client("sts").get_caller_identity()["Account"]
-                    function = f"arn:aws:lambda:{session.region_name}:{account}:function:{function}"
-                target = LambdaTarget(
-                    session=session, function_arn=function, schema_search=schema_search, schema_arn=schema_arn
-                )
-                handler(cls, target, kwargs)
-
-            return command
-
-        @classmethod
-        def get_get_schema_command(cls, handler: Callable[[Type["Platform"], Target, Mapping], None]) -> click.Command:
-            @click.command()
-            @click.argument("function")
-            @click.option("--profile", metavar="PROFILE")
-            def command(function, profile, **kwargs):
-                session = boto3.Session(profile_name=profile)
-                if not function.startswith("arn:"):
-                    account = session.client("sts").get_caller_identity()["Account"]
-                    function = f"arn:aws:lambda:{session.region_name}:{account}:function:{function}"
-                target = LambdaTarget(
-                    session=session, function_arn=function
-                )
-                handler(cls, target, kwargs)
-
-            return command
-
-
-        @classmethod
-        def _iter_tags(cls, session: boto3.Session, already_returned: set):
-            resource_client = session.client("resourcegroupstaggingapi")
-            paginator = resource_client.get_paginator("get_resources")
-
-            tag_filters = []
-            tag_filters.append({"Key": cls.TAG_KEY})
-
-            args = {"TagFilters": tag_filters, "ResourceTypeFilters": ["lambda:function"]}
-
-            class Skip(Exception):
-                pass
-
-            for response in paginator.paginate(**args):
-                for resource in response["ResourceTagMappingList"]:
-                    function_arn = resource["ResourceARN"]
-                    if function_arn in already_returned:
-                        continue
-                    already_returned.add(function_arn)
-                    try:
-                        description = None
-                        for tag in resource["Tags"]:
-                            if tag["Key"] == cls.TAG_KEY:
-                                value = tag["Value"]
-                                if value.lower() == "false":
-                                    raise Skip
-                                if value.lower() != "true":
-                                    description = value
-                                break
-                        yield LambdaTarget(
-                            session=session, function_arn=function_arn, description=description
-                        )
-                    except Skip:
-                        continue
-
-        @classmethod
-        def _iter_env(cls, session: boto3.Session, already_returned: set):
-            lambda_client = session.client("lambda")
-            paginator = lambda_client.get_paginator("list_functions")
-            class Skip(Exception):
-                pass
-            for response in paginator.paginate():
-                for function in response.get("Functions", []):
-                    function_arn = function["FunctionArn"]
-                    if function_arn in already_returned:
-                        continue
-                    already_returned.add(function_arn)
-                    try:
-                        for env_key, env_value in (
-                            function.get("Environment", {}).get("Variables", {}).items()
-                        ):
-                            if env_key == cls.TAG_KEY:
-                                description = None
-                                if env_value.lower() == "false":
-                                    raise Skip
-                                if env_value.lower() != "true":
-                                    description = env_value
-                                yield LambdaTarget(
-                                    session=session, function_arn=function_arn, description=description
-                                )
-                                break
-                    except Skip:
-                        continue
-
-
-        @classmethod
-        def _iter_ssm(cls, session: boto3.Session, already_returned: set):
-            return []
-
-    PLATFORMS = [LambdaPlatform]
-except ModuleNotFoundError:
-    PLATFORMS = []
+                    for env_key, env_value in (
+                        function.get("Environment", {}).get("Variables", {}).items()
+                    ):
+                        if env_key == cls.TAG_KEY:
+                            description = None
+                            if env_value.lower() == "false":
+                                raise Skip
+                            if env_value.lower() != "true":
+                                description = env_value
+                            yield LambdaTarget(
+                                session=session, function_arn=function_arn, description=description,
+                                schema_store=schema_store, policy=policy
+                            )
+                            break
+                except Skip:
+                    continue
+
+
+    @classmethod
+    def _iter_ssm(cls, session: "boto3.Session", already_returned: set, schema_store: SchemaStore,
+            policy: RequestPolicy):
+        return []
+
+PLATFORMS = [LambdaPlatform] if importlib.util.find_spec("boto3") else []
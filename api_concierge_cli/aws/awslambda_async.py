@@ -0,0 +1,346 @@
+"""Asyncio transport for Lambda, so many invocations can be in flight on one
+event loop.
+
+Requests are signed with botocore and sent as HTTP/1.1 over pooled
+keep-alive connections on asyncio streams. Only the Invoke API is
+supported; discovery and everything else still go through boto3.
+
+Connections are made directly to the endpoint, verified against the
+session's CA bundle (AWS_CA_BUNDLE or ca_bundle in the config) or the
+system's. Proxies aren't supported, so targets fall back to boto3 on
+threads when one is configured for the endpoint."""
+
+import asyncio
+import itertools
+import ssl
+import time
+from collections import deque
+from typing import Any, Dict, Deque, Optional, Tuple, Type, Union, TYPE_CHECKING
+from urllib.parse import quote, urlsplit
+
+from .. import codec
+from ..types import (
+    InvocationRequest,
+    SchemaRequest,
+    SchemaResponse,
+    ErrorResponse,
+    load_invocation_response,
+)
+from ..platform import (
+    RequestError,
+    TransientRequestError,
+    ThrottlingError,
+    ConnectionFailedError,
+    RequestPolicy,
+    RequestRecord,
+    AsyncTarget,
+)
+from .awslambda import (
+    THROTTLING_ERROR_CODES,
+    _Round,
+    _get_function_error,
+    _get_request_record,
+)
+
+if TYPE_CHECKING:
+    import boto3
+    from .awslambda import LambdaTarget
+
+API_VERSION = "2015-03-31"
+MAX_CONNECTIONS = 1000
+
+
+class _ServerClosedError(Exception):
+    """The connection was closed before the request was delivered."""
+    pass
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class AsyncLambdaTransport:
+    def __init__(self, session: "boto3.Session", endpoint_url: str, region: str,
+            max_connections: int = MAX_CONNECTIONS, ca_bundle: Optional[str] = None) -> None:
+        self.session = session
+        self.region = region
+        url = urlsplit(endpoint_url)
+        self.host = url.hostname
+        self.secure = url.scheme == "https"
+        self.port = url.port or (443 if self.secure else 80)
+        self.host_header = url.netloc
+        self.max_connections = max_connections
+        self._loop = None
+        self._idle = deque()  # type: Deque[_Connection]
+        self._semaphore = None  # type: Optional[asyncio.Semaphore]
+        self._ssl_context = ssl.create_default_context(cafile=ca_bundle) if self.secure else None
+        # targets share a transport per session, so it's only closed once
+        # none of them are using it
+        self._users = 0
+        self._credentials = None
+
+    def _bind_loop(self) -> None:
+        # pooled connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._close_idle()
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+
+    def _close_idle(self) -> None:
+        while self._idle:
+            try:
+                self._idle.popleft().close()
+            except RuntimeError:
+                # opened on a loop that has since been closed, along with its sockets
+                pass
+
+    async def _connect(self, connect_timeout: float) -> _Connection:
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self._ssl_context),
+                timeout=connect_timeout,
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise ConnectionFailedError(f"Could not connect to {self.host}: {e!r}") from e
+        return _Connection(reader, writer)
+
+    def _resolve_credentials(self) -> Any:
+        credentials = self.session.get_credentials()
+        if credentials is None:
+            raise RequestError("Unable to locate credentials")
+        self._credentials = credentials
+        return credentials.get_frozen_credentials()
+
+    async def _get_frozen_credentials(self) -> Any:
+        # resolving or refreshing credentials can call STS or SSO, so it's
+        # done on a thread rather than blocking every request on the loop
+        credentials = self._credentials
+        refresh_needed = getattr(credentials, "refresh_needed", None)
+        if credentials is None or (refresh_needed and refresh_needed()):
+            return await asyncio.get_running_loop().run_in_executor(None, self._resolve_credentials)
+        return credentials.get_frozen_credentials()
+
+    def _sign(self, path: str, body: bytes, credentials: Any) -> Dict[str, str]:
+        from botocore.auth import SigV4Auth
+        from botocore.awsrequest import AWSRequest
+        request = AWSRequest(
+            method="POST",
+            url=f"{'https' if self.secure else 'http'}://{self.host_header}{path}",
+            data=body,
+            headers={"Content-Type": "application/json", "X-Amz-Invocation-Type": "RequestResponse"},
+        )
+        SigV4Auth(credentials, "lambda", self.region).add_auth(request)
+        return dict(request.headers.items())
+
+    async def _send(self, connection: _Connection, path: str, headers: Dict[str, str],
+            body: bytes, read_timeout: float) -> Tuple[int, Dict[str, str], bytes, bool]:
+        lines = [f"POST {path} HTTP/1.1", f"Host: {self.host_header}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        try:
+            connection.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+            await connection.writer.drain()
+        except OSError:
+            raise _ServerClosedError
+
+        reader = connection.reader
+        status_line = await asyncio.wait_for(reader.readline(), timeout=read_timeout)
+        if not status_line:
+            raise _ServerClosedError
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=read_timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await asyncio.wait_for(reader.readline(), timeout=read_timeout)).split(b";")[0], 16)
+                if size == 0:
+                    await asyncio.wait_for(reader.readline(), timeout=read_timeout)
+                    break
+                chunks.append(await asyncio.wait_for(reader.readexactly(size + 2), timeout=read_timeout))
+            response_body = b"".join(chunk[:-2] for chunk in chunks)
+        else:
+            length = int(response_headers.get("content-length", "0"))
+            response_body = await asyncio.wait_for(reader.readexactly(length), timeout=read_timeout)
+        keep_alive = response_headers.get("connection", "").lower() != "close"
+        return status, response_headers, response_body, keep_alive
+
+    async def invoke(self, function_name: str, payload: bytes, *,
+            connect_timeout: float, read_timeout: float) -> Tuple[Dict[str, str], Any]:
+        """Invoke a function, returning the response headers and decoded payload."""
+        self._bind_loop()
+        path = f"/{API_VERSION}/functions/{quote(function_name, safe='')}/invocations"
+        headers = self._sign(path, payload, await self._get_frozen_credentials())
+        async with self._semaphore:
+            for reused in (True, False):
+                connection = self._idle.popleft() if reused and self._idle else None
+                if connection is None:
+                    reused = False
+                    connection = await self._connect(connect_timeout)
+                try:
+                    status, response_headers, body, keep_alive = await self._send(
+                        connection, path, headers, payload, read_timeout)
+                except _ServerClosedError:
+                    connection.close()
+                    if reused:
+                        # the server closed an idle connection; nothing was processed
+                        continue
+                    raise TransientRequestError("Connection closed without a response")
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError, IndexError) as e:
+                    connection.close()
+                    raise TransientRequestError(f"Error reading response: {e!r}") from e
+                except BaseException:
+                    # e.g., a hedged attempt being cancelled mid-response
+                    connection.close()
+                    raise
+                if keep_alive:
+                    self._idle.append(connection)
+                else:
+                    connection.close()
+                break
+
+        if status >= 400:
+            raise self._get_error(status, response_headers, body)
+        return response_headers, codec.loads(body) if body else None
+
+    @classmethod
+    def _get_error(cls, status: int, headers: Dict[str, str], body: bytes) -> RequestError:
+        error_code = headers.get("x-amzn-errortype", "").split(":")[0]
+        message = ""
+        try:
+            error_payload = codec.loads(body) if body else None
+        except ValueError:
+            # e.g., an HTML page from a proxy or load balancer
+            error_payload = None
+        if isinstance(error_payload, dict):
+            error_code = error_code or error_payload.get("Type", "")
+            message = error_payload.get("message") or error_payload.get("Message") or ""
+        error = f"An error occurred ({error_code or status}) when calling the Invoke operation: {message}"
+        if status == 429 or error_code in THROTTLING_ERROR_CODES:
+            return ThrottlingError(error)
+        if status >= 500:
+            return TransientRequestError(error)
+        return RequestError(error)
+
+    def open(self) -> None:
+        self._users += 1
+
+    async def aclose(self) -> None:
+        self._users = max(0, self._users - 1)
+        if not self._users:
+            self._close_idle()
+
+
+class AsyncLambdaTarget(AsyncTarget):
+    """The async counterpart of a LambdaTarget, sharing its policy and schema store."""
+
+    def __init__(self, target: "LambdaTarget", transport: AsyncLambdaTransport) -> None:
+        self.target = target
+        self.transport = transport
+        self.transport.open()
+        self._closed = False
+        self._last_request_record = None
+
+    @property
+    def policy(self) -> RequestPolicy:
+        return self.target.policy
+
+    def get_name(self) -> str:
+        return self.target.get_name()
+
+    def get_description(self) -> Optional[str]:
+        return self.target.get_description()
+
+    def get_last_request_record(self) -> Optional[RequestRecord]:
+        return self._last_request_record
+
+    async def _invoke_function(self, payload: bytes, read_timeout: float) -> Any:
+        response_headers, response_payload = await self.transport.invoke(
+            self.target.arn, payload,
+            connect_timeout=self.policy.connect_timeout, read_timeout=read_timeout,
+        )
+        function_error = response_headers.get("x-amz-function-error")
+        if function_error:
+            raise _get_function_error(function_error, response_payload)
+        return response_payload
+
+    async def _invoke_function_within(self, payload: bytes, read_timeout: float, timeout: Optional[float],
+            hedge_after: Optional[float]) -> Tuple[Any, Optional[Exception], int, int]:
+        timing = _Round(timeout, hedge_after)
+        tasks = {asyncio.ensure_future(self._invoke_function(payload, read_timeout)): 1}
+        error, index = None, 1
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(tasks, timeout=timing.get_wait(), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if timing.hedge():
+                        tasks[asyncio.ensure_future(self._invoke_function(payload, read_timeout))] = 2
+                        continue
+                    return None, TransientRequestError("Deadline exceeded"), 0, timing.sent
+                for task in done:
+                    index = tasks.pop(task)
+                    if task.exception() is None:
+                        return task.result(), None, index, timing.sent
+                    error = task.exception()
+            return None, error, index, timing.sent
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _request(self, phase: str, payload: bytes, *, read_timeout: float, deadline: Optional[float],
+            hedge: bool, retryable: Tuple[Type[Exception], ...]) -> Any:
+        start = time.monotonic()
+        sent = 0
+        for attempt in itertools.count(1):
+            remaining = None if deadline is None else deadline - (time.monotonic() - start)
+            response_payload, error, index, round_sent = await self._invoke_function_within(
+                payload, read_timeout, remaining, self.policy.hedge_after if hedge else None)
+            if error is None:
+                self._last_request_record = _get_request_record(phase, start, sent, index, round_sent)
+                return response_payload
+            sent += round_sent
+            delay = self.policy.get_retry_delay(error, attempt, time.monotonic() - start, deadline, retryable)
+            if delay is None:
+                raise error
+            await asyncio.sleep(delay)
+
+    async def _request_schema(self, request: SchemaRequest) -> SchemaResponse:
+        response_payload = await self._request(
+            "schema", request.get_payload_bytes(), **self.target._get_schema_request_options())
+        return SchemaResponse.load_from_payload(response_payload)
+
+    async def request_schema(self, request: SchemaRequest) -> SchemaResponse:
+        self.target._check_schema_source()
+        schema_store = self.target.schema_store
+        if not schema_store:
+            return await self._request_schema(request)
+        requests = schema_store.iter_requests(self.target.arn, request)
+        try:
+            request = next(requests)
+            while True:
+                request = requests.send(await self._request_schema(request))
+        except StopIteration as e:
+            return e.value
+
+    async def invoke(
+        self, request: InvocationRequest
+    ) -> Union[SchemaResponse, ErrorResponse, Any]:
+        response_payload = await self._request(
+            "invoke", request.get_payload_bytes(), **self.target._get_invoke_request_options())
+        return load_invocation_response(response_payload)
+
+    async def aclose(self) -> None:
+        if not self._closed:
+            self._closed = True
+            await self.transport.aclose()
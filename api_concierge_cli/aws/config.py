@@ -0,0 +1,32 @@
+"""Reads the AWS configuration without importing boto3, for completion."""
+
+from __future__ import annotations
+
+import os
+
+# as in cache, only type checkers import typing
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Optional
+
+def get_configured_region(profile: Optional[str]) -> Optional[str]:
+    """The region a session for the profile would use."""
+    region = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
+    if region:
+        return region
+    import configparser
+    profile = profile or os.environ.get("AWS_PROFILE") or "default"
+    config_path = os.path.expanduser(os.environ.get("AWS_CONFIG_FILE", "~/.aws/config"))
+    config = configparser.RawConfigParser()
+    try:
+        config.read(config_path)
+    except configparser.Error:
+        return None
+    section = "default" if profile == "default" else f"profile {profile}"
+    return config.get(section, "region", fallback=None)
+
+def get_cache_key(profile: Optional[str], region: Optional[str]) -> str:
+    """The target cache key for a profile and region."""
+    # function names are only unique within an account and region
+    profile = profile or os.environ.get("AWS_PROFILE") or "default"
+    return f"{profile}-{region or 'none'}"
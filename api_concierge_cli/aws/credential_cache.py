@@ -0,0 +1,119 @@
+"""File-based cache of temporary credentials, shared across CLI runs.
+
+botocore caches the credentials for assume-role, web identity, and SSO
+profiles only in memory, so every run of the CLI assumes the role again (and
+may prompt for MFA). This plugs a file cache into those providers, as the AWS
+CLI does. Entries hold credentials, so the directory and files are only
+readable by the user, and expired entries are removed when they're read;
+botocore refreshes credentials that are close to expiring itself."""
+
+import datetime
+import os
+import tempfile
+from typing import Any, Optional, TYPE_CHECKING
+
+from .. import codec
+from ..cache import get_cache_dir
+
+if TYPE_CHECKING:
+    import boto3
+
+NO_CREDENTIAL_CACHE_ENV_VAR = "API_CONCIERGE_NO_CREDENTIAL_CACHE"
+
+CACHING_PROVIDERS = ["assume-role", "assume-role-with-web-identity", "sso"]
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _serialize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_serialize(v) for v in value]
+    return value
+
+class CredentialCache:
+    """The dict-like interface botocore's credential fetchers use for their cache."""
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = directory or os.path.join(get_cache_dir(), "credentials")
+
+    def _path(self, key: str) -> str:
+        # botocore's keys are hashes, but make sure they can't escape the directory
+        safe_key = "".join(c if c.isalnum() or c in "-_." else "_" for c in key)
+        return os.path.join(self.directory, safe_key + ".json")
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __getitem__(self, key: str) -> Any:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fp:
+                value = codec.loads(fp.read())
+        except (OSError, ValueError):
+            raise KeyError(key)
+        if self._is_expired(value):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        # botocore doesn't catch errors writing to its cache, and the
+        # credentials are still good without it
+        path = self._path(key)
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            # mkstemp creates the file readable only by the user, rather than
+            # chmod after writing, and with a name unique to this writer
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(codec.dumps_bytes(_serialize(value)))
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path is None:
+                return
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def __delitem__(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    @classmethod
+    def _is_expired(cls, value: Any) -> bool:
+        try:
+            expiration = value["Credentials"]["Expiration"]
+        except (KeyError, TypeError):
+            return True
+        from botocore.utils import parse_timestamp
+        try:
+            expiration = parse_timestamp(expiration)
+        except (ValueError, TypeError):
+            return True
+        return expiration <= datetime.datetime.now(datetime.timezone.utc)
+
+def install(session: "boto3.Session", credential_cache: Optional[CredentialCache] = None) -> None:
+    """Use the file cache for the session's credential providers that support one.
+
+    This must be called before the session resolves its credentials."""
+    import botocore.exceptions
+    credential_cache = credential_cache or CredentialCache()
+    resolver = session._session.get_component("credential_provider")
+    for name in CACHING_PROVIDERS:
+        try:
+            provider = resolver.get_provider(name)
+        except botocore.exceptions.UnknownCredentialError:
+            continue
+        provider.cache = credential_cache
@@ -0,0 +1,129 @@
+"""Local cache of discovered targets, used for shell completion.
+
+The cache is written as a side effect of unfiltered list runs, and read when
+completing target names, which must be fast: nothing here talks to a
+platform or imports its SDK. When the cache is stale, completion starts a
+list run in the background to refresh it."""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+# only type checkers import these; typing alone costs completion about 10ms
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+    import click
+    from .platform import Target
+
+CACHE_DIR_ENV_VAR = "API_CONCIERGE_CACHE_DIR"
+TARGET_CACHE_TTL = 60 * 60
+REFRESH_INTERVAL = 60
+
+def get_cache_dir() -> str:
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR)
+    if not cache_dir:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(base, "api-concierge")
+    return cache_dir
+
+def write_file(path: str, data: bytes) -> None:
+    import tempfile
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # a unique temporary file, since threads in a sweep may write the same path
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _get_target_cache_path(platform_name: str, key: str) -> str:
+    safe_key = "".join(c if c.isalnum() or c in "-_." else "_" for c in key)
+    return os.path.join(get_cache_dir(), "targets", f"{platform_name}-{safe_key}.json")
+
+def write_targets(platform_name: str, key: str, targets: Iterable[Target]) -> None:
+    from . import codec
+    entries = [{"name": t.get_name(), "description": t.get_description()} for t in targets]
+    try:
+        write_file(_get_target_cache_path(platform_name, key), codec.dumps_bytes(entries))
+    except OSError:
+        pass
+
+def read_targets(platform_name: str, key: str) -> Optional[List[dict]]:
+    # the list is small, and importing orjson would cost completion more than it saves
+    import json
+    try:
+        with open(_get_target_cache_path(platform_name, key), "rb") as fp:
+            return json.loads(fp.read())
+    except (OSError, ValueError):
+        return None
+
+def caching_targets(platform_name: str, key: str, targets: Iterable[Target]) -> Iterator[Target]:
+    """Pass targets through, writing them to the cache once they've all been seen."""
+    seen = []
+    for target in targets:
+        seen.append(target)
+        yield target
+    write_targets(platform_name, key, seen)
+
+def _is_stale(path: str, ttl: float) -> bool:
+    try:
+        return time.time() - os.path.getmtime(path) > ttl
+    except OSError:
+        return True
+
+def _refresh_in_background(platform_name: str, key: str, refresh_args: List[str]) -> None:
+    # don't start a refresh on every key press while one is running
+    marker_path = _get_target_cache_path(platform_name, key) + ".refresh"
+    if not _is_stale(marker_path, REFRESH_INTERVAL):
+        return
+    import subprocess
+    try:
+        write_file(marker_path, b"")
+        subprocess.Popen(
+            [sys.executable, "-m", "api_concierge_cli", platform_name, "list"] + refresh_args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        pass
+
+def complete_targets(
+    platform_name: str, key: str, refresh_args: List[str], incomplete: str
+) -> List[Tuple[str, Optional[str]]]:
+    """The (name, description) of each cached target starting with incomplete,
+    refreshing the cache in the background if it's stale."""
+    if _is_stale(_get_target_cache_path(platform_name, key), TARGET_CACHE_TTL):
+        _refresh_in_background(platform_name, key, refresh_args)
+    entries = read_targets(platform_name, key) or []
+    return [
+        (entry["name"], entry.get("description"))
+        for entry in entries
+        if entry["name"].startswith(incomplete)
+    ]
+
+def get_target_completer(
+    platform_name: str,
+    get_key: Callable[[click.Context], str],
+    get_refresh_args: Callable[[click.Context], List[str]],
+):
+    """Returns a shell_complete function for a target name argument."""
+    from click.shell_completion import CompletionItem
+
+    def complete(ctx: click.Context, param: click.Parameter, incomplete: str) -> List[CompletionItem]:
+        targets = complete_targets(platform_name, get_key(ctx), get_refresh_args(ctx), incomplete)
+        return [CompletionItem(name, help=description) for name, description in targets]
+
+    return complete
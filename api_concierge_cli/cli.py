@@ -2,20 +2,30 @@ from typing import cast
 
 import click
 
-from . import __version__
+from . import __version__, profiling
 from .list import list_handler, add_global_list_options
 from .invoke import invoke_handler, add_global_invoke_options
 from .get_schema import get_schema_handler, add_global_get_schema_options
 from .aws import awslambda
+from . import local
 from .platform import Platform
 
 
 @click.group(name="api-concierge")
 @click.version_option(version=__version__, message="%(version)s")
-def cli():
-    pass
-
-for module in [awslambda]:
+@click.option("--profile-cpu", metavar="FILE", envvar="API_CONCIERGE_PROFILE_CPU",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Profile the command and write pstats to FILE.")
+@click.option("--profile-mem", is_flag=True, envvar="API_CONCIERGE_PROFILE_MEM",
+    help="Trace allocations and report peak memory and top allocation sites.")
+@click.pass_context
+def cli(ctx: click.Context, profile_cpu, profile_mem):
+    if profile_mem:
+        ctx.call_on_close(profiling.start_memory_profile())
+    if profile_cpu:
+        ctx.call_on_close(profiling.start_cpu_profile(profile_cpu))
+
+for module in [awslambda, local]:
     for platform in module.PLATFORMS:
         platform = cast(Platform, platform)
         name = platform.get_name()
@@ -0,0 +1,119 @@
+"""JSON encoding and decoding, using orjson when it is installed and the
+standard library otherwise.
+
+Payloads are encoded straight to bytes for transport. Output for display is
+indented by two spaces either way. orjson is only used where it gives the
+same result as stdlib: long integers, NaN and infinities, and types stdlib
+can't serialize (e.g., datetimes) are left to stdlib."""
+
+import json
+import marshal
+import math
+import re
+from typing import Any, IO, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSONDecodeError = json.JSONDecodeError
+
+if orjson is not None:
+    # types orjson would serialize but stdlib rejects are passed to
+    # _reject_type, so they fail the same way with or without orjson (UUIDs
+    # can't be passed through, and are still serialized)
+    _ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_SUBCLASS)
+
+def _reject_type(value: Any) -> Any:
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _walk_for_non_finite_float(value: Any) -> bool:
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        value_type = type(value)
+        if value_type is dict:
+            stack.extend(value.values())
+        elif value_type is list or value_type is tuple:
+            stack.extend(value)
+        elif value_type is float and value - value != 0:
+            # NaN and infinities are the only floats where this is nonzero (NaN)
+            return True
+    return False
+
+# walking a large payload in Python costs several times what orjson takes to
+# encode it, so floats are found in its marshal encoding instead, where they
+# are a type code ("g", possibly with the 0x80 ref flag) and 8 little-endian
+# bytes; non-finite floats have all exponent bits set
+_MARSHAL_NON_FINITE_FLOAT = re.compile(rb"[g\xe7][\x00-\xff]{6}[\xf0-\xff][\x7f\xff]", re.DOTALL)
+
+def _marshal_finds_non_finite_floats() -> bool:
+    values = [math.nan, -math.inf, [1.5, math.inf]]
+    return (all(_MARSHAL_NON_FINITE_FLOAT.search(marshal.dumps(v)) for v in values)
+        and not _MARSHAL_NON_FINITE_FLOAT.search(marshal.dumps([1.5, -1, 1e308, "g"])))
+
+# the marshal format isn't guaranteed across Python versions, so check it
+_USE_MARSHAL = _marshal_finds_non_finite_floats()
+
+def _has_non_finite_float(value: Any) -> bool:
+    if _USE_MARSHAL:
+        try:
+            if not _MARSHAL_NON_FINITE_FLOAT.search(marshal.dumps(value)):
+                return False
+        except ValueError:
+            # e.g., a UUID, or nested too deeply
+            pass
+        # the bytes can also occur in other values, so make sure
+    return _walk_for_non_finite_float(value)
+
+def _orjson_dumps(value: Any, option: int = 0) -> Optional[bytes]:
+    """Encode with orjson, or return None if stdlib should be used."""
+    try:
+        data = orjson.dumps(value, default=_reject_type, option=_ORJSON_OPTIONS | option)
+    except TypeError:
+        # e.g., integers over 64 bits, non-string keys, or a type that stdlib
+        # will reject itself
+        return None
+    # orjson writes NaN and infinities as null, where stdlib writes them
+    # out; only look for them if there's a null they could have become
+    if b"null" in data and _has_non_finite_float(value):
+        return None
+    return data
+
+def dumps_bytes(value: Any) -> bytes:
+    if orjson is not None:
+        data = _orjson_dumps(value)
+        if data is not None:
+            return data
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+def dumps(value: Any, *, indent: bool = False) -> str:
+    if orjson is not None:
+        data = _orjson_dumps(value, orjson.OPT_INDENT_2 if indent else 0)
+        if data is not None:
+            return data.decode("utf-8")
+    return json.dumps(value, indent=2 if indent else None)
+
+# maps digits to 0 and everything else to 1, so runs of digits can be found
+# with a substring search, which is much faster than a regex
+_DIGITS = bytes(0 if c in b"0123456789" else 1 for c in range(256))
+# integers over 64 bits have at least 19 digits
+_LONG_DIGITS = bytes(19)
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    if orjson is not None:
+        # orjson decodes integers over 64 bits as floats, losing precision,
+        # and rejects NaN and Infinity, which json.dumps writes by default;
+        # stdlib handles both
+        raw = data.encode("utf-8") if isinstance(data, str) else data
+        if _LONG_DIGITS not in raw.translate(_DIGITS):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+    return json.loads(data)
+
+def load(fp: IO) -> Any:
+    return loads(fp.read())
@@ -0,0 +1,97 @@
+"""Answer shell completion of target names straight from the cache.
+
+Click can only complete once the whole CLI is built, which imports every
+platform, jsonschema, and the prompter, taking far longer than a key press
+should. The common case, completing the target of invoke or get-schema with
+at most a --profile before it, is answered here before any of that is
+imported, writing what click would; anything else is left to click."""
+
+from __future__ import annotations
+
+import os
+import sys
+
+from . import cache
+
+# as in cache, only type checkers import typing
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable, Dict, List, Optional, Tuple
+
+COMPLETE_VAR = "_API_CONCIERGE_COMPLETE"
+
+TARGET_COMMANDS = ["invoke", "get-schema"]
+
+def _get_lambda_cache_key(profile: Optional[str]) -> str:
+    from .aws.config import get_cache_key, get_configured_region
+    return get_cache_key(profile, get_configured_region(profile))
+
+# platform name -> cache key for a --profile value
+_CACHE_KEYS = {
+    "lambda": _get_lambda_cache_key,
+}  # type: Dict[str, Callable[[Optional[str]], str]]
+
+def _split_arg_string(string: str) -> List[str]:
+    # as click does, keeping a partial last token
+    import shlex
+    lex = shlex.shlex(string, posix=True)
+    lex.whitespace_split = True
+    lex.commenters = ""
+    out = []  # type: List[str]
+    try:
+        out.extend(lex)
+    except ValueError:
+        out.append(lex.token)
+    return out
+
+def _get_completion_args(instruction: str) -> Tuple[List[str], str]:
+    cwords = _split_arg_string(os.environ["COMP_WORDS"])
+    if instruction == "fish_complete":
+        incomplete = os.environ["COMP_CWORD"]
+        if incomplete:
+            incomplete = _split_arg_string(incomplete)[0]
+        args = cwords[1:]
+        # fish includes the partial word in COMP_WORDS as well
+        if incomplete and args and args[-1] == incomplete:
+            args.pop()
+        return args, incomplete
+    cword = int(os.environ["COMP_CWORD"])
+    incomplete = cwords[cword] if cword < len(cwords) else ""
+    return cwords[1:cword], incomplete
+
+def _format_completion(instruction: str, name: str, description: Optional[str]) -> str:
+    if instruction == "zsh_complete":
+        help_ = description or "_"
+        # zsh splits the value from the help at the first unescaped colon
+        value = name.replace(":", r"\:") if help_ != "_" else name
+        return f"plain\n{value}\n{help_}"
+    if instruction == "fish_complete" and description:
+        help_ = description.replace("\n", "\\n").replace("\t", " ")
+        return f"plain,{name}\t{help_}"
+    return f"plain,{name}"
+
+def complete_from_cache() -> bool:
+    """Write the completions if a target name is being completed, returning
+    False if it's something else, for click to complete."""
+    instruction = os.environ.get(COMPLETE_VAR)
+    if instruction not in ("bash_complete", "zsh_complete", "fish_complete"):
+        return False
+    try:
+        args, incomplete = _get_completion_args(instruction)
+    except (KeyError, ValueError, IndexError):
+        return False
+    if len(args) < 2 or args[0] not in _CACHE_KEYS or args[1] not in TARGET_COMMANDS:
+        return False
+    platform_name, options = args[0], args[2:]
+    profile = None
+    if len(options) == 2 and options[0] == "--profile":
+        profile = options[1]
+        options = []
+    if options or incomplete.startswith("-"):
+        return False
+    key = _CACHE_KEYS[platform_name](profile)
+    refresh_args = ["--profile", profile] if profile else []
+    targets = cache.complete_targets(platform_name, key, refresh_args, incomplete)
+    lines = [_format_completion(instruction, name, description) for name, description in targets]
+    sys.stdout.write("\n".join(lines) + "\n")
+    return True
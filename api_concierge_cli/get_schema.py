@@ -1,4 +1,3 @@
-import json
 import sys
 import textwrap
 from typing import Mapping, Type, Any
@@ -16,12 +15,12 @@ from .types import (
 
 from .platform import Target, Platform, RequestError
 
-from . import __version__
+from . import __version__, codec, profiling
 
 CLIENT = f"api-concierge-cli {__version__}"
 
 def _json_dump(v: Any) -> str:
-    return json.dumps(v, indent=2)
+    return codec.dumps(v, indent=True)
 
 def add_global_get_schema_options(invoke_command: click.Command):
     invoke_command.params.append(click.Option(["--show-all/--schema-only"]))
@@ -29,7 +28,8 @@ def add_global_get_schema_options(invoke_command: click.Command):
 def get_schema_handler(platform: Type[Platform], target: Target, kwargs: Mapping):
     schema_request = SchemaRequest(client=CLIENT)
     try:
-        schema_response = target.request_schema(schema_request)
+        with profiling.phase("request_schema"):
+            schema_response = target.request_schema(schema_request)
     except InvalidSchemaResponseError:
         print("Invalid schema response", file=sys.stderr)
         sys.exit(1)
@@ -44,6 +44,10 @@ def get_schema_handler(platform: Type[Platform], target: Target, kwargs: Mapping
         print(_json_dump(schema_response.schema))
         return
 
+    record = target.get_last_request_record()
+    if record:
+        hedge = " (hedge)" if record.hedged else ""
+        print(f"Request: attempt {record.winner} of {record.attempts}{hedge} in {record.latency * 1000:.0f}ms")
     if schema_response.instructions:
         print(textwrap.fill(f"Instructions: {schema_response.instructions}"))
     if schema_response.state:
@@ -53,6 +57,8 @@ def get_schema_handler(platform: Type[Platform], target: Target, kwargs: Mapping
         print(_json_dump(schema_response.base))
         if schema_response.path is not None:
             print(f"Path: {schema_response.path!r}")
+    if schema_response.schema_hash:
+        print(f"Schema hash: {schema_response.schema_hash}")
     print("Schema:")
     print(_json_dump(schema_response.schema))
     #TODO: state, base, etc.
@@ -1,9 +1,8 @@
-import json
 import sys
 import copy
 import itertools
 import textwrap
-from typing import Mapping, Type, Any
+from typing import Mapping, Optional, Tuple, Type, Any
 
 import click
 
@@ -11,6 +10,8 @@ from jsonschema_prompt import prompt
 
 import jsonpointer
 
+import jsonschema
+
 from .types import (
     SchemaRequest,
     SchemaResponse,
@@ -23,13 +24,19 @@ from .types import (
 )
 
 from .platform import Target, Platform, RequestError
+from .preprocess import preprocess_schema
 
-from . import __version__
+from . import __version__, codec, profiling
 
 CLIENT = f"api-concierge-cli {__version__}"
 
+# unresolvable refs raise RefResolutionError, which is deprecated (with a
+# warning on access) since jsonschema 4.18 in favor of this private base
+_REF_RESOLUTION_ERRORS = getattr(jsonschema.exceptions, "_RefResolutionError", None) \
+    or jsonschema.exceptions.RefResolutionError
+
 def _json_dump(v: Any) -> str:
-    return json.dumps(v, indent=2)
+    return codec.dumps(v, indent=True)
 
 def _validate_set(ctx, param, value):
     set_values = {}
@@ -39,8 +46,8 @@ def _validate_set(ctx, param, value):
         except jsonpointer.JsonPointerException as e:
             raise click.BadParameter(f"Path {key} is invalid: {e}")
         try:
-            value = json.loads(value)
-        except json.JSONDecodeError:
+            value = codec.loads(value)
+        except codec.JSONDecodeError:
             pass
         set_values[key] = value
     return set_values
@@ -51,13 +58,75 @@ def add_global_invoke_options(invoke_command: click.Command):
         callback=_validate_set))
     invoke_command.params.append(click.Option(["--show-schema/--no-show-schema"]))
     invoke_command.params.append(click.Option(["--show-event/--no-show-event"]))
+    invoke_command.params.append(click.Option(["--no-input"], is_flag=True,
+        help="Fail instead of prompting if the --set values don't form a valid payload, or if the service asks for more input."))
+
+def _build_from_set_values(set_values: Mapping[str, Any]) -> Any:
+    """Build a document from JSON pointers and values, or raise ValueError."""
+    document = None
+    pointers = [(jsonpointer.JsonPointer(key), value) for key, value in set_values.items()]
+    for pointer, value in sorted(pointers, key=lambda item: len(item[0].parts)):
+        if not pointer.parts:
+            document = copy.deepcopy(value)
+            continue
+        if document is None:
+            document = {}
+        container = document
+        for i, part in enumerate(pointer.parts):
+            last = i == len(pointer.parts) - 1
+            if last:
+                child = value
+            else:
+                next_part = pointer.parts[i + 1]
+                child = [] if next_part == "-" or next_part.isdigit() else {}
+            if isinstance(container, dict):
+                if last or part not in container:
+                    container[part] = child
+                container = container[part]
+            elif isinstance(container, list) and (part == "-" or part.isdigit()):
+                index = len(container) if part == "-" else int(part)
+                if index == len(container):
+                    container.append(child)
+                elif index < len(container):
+                    if last:
+                        container[index] = child
+                else:
+                    raise ValueError(f"Index {index} in {pointer.path} is past the end of the array")
+                container = container[index]
+            else:
+                raise ValueError(f"Cannot set {pointer.path}")
+    return {} if document is None else document
+
+def _get_complete_value(schema: Any, set_values: Mapping[str, Any]) -> Tuple[Any, Optional[str]]:
+    """If the set values form a payload that's valid for the schema, return
+    it with no error; otherwise return the reason it isn't."""
+    try:
+        value = _build_from_set_values(set_values)
+    except ValueError as e:
+        return None, str(e)
+    validator_cls = jsonschema.validators.validator_for(schema)
+    try:
+        validator_cls.check_schema(schema)
+        error = jsonschema.exceptions.best_match(validator_cls(schema).iter_errors(value))
+    except jsonschema.exceptions.SchemaError as e:
+        return None, f"invalid schema: {e.message}"
+    except jsonschema.exceptions.UnknownType as e:
+        return None, f"invalid schema: unknown type {e.type!r}"
+    except _REF_RESOLUTION_ERRORS as e:
+        return None, f"invalid schema: {e}"
+    if error:
+        location = "/" + "/".join(str(part) for part in error.absolute_path)
+        return None, f"{location}: {error.message}"
+    return value, None
 
 def invoke_handler(platform: Type[Platform], target: Target, kwargs: Mapping):
     set_values = kwargs.get("set", {})
+    no_input = kwargs.get("no_input")
 
     schema_request = SchemaRequest(client=CLIENT)
     try:
-        schema_response = target.request_schema(schema_request)
+        with profiling.phase("request_schema"):
+            schema_response = target.request_schema(schema_request)
     except InvalidSchemaResponseError:
         print("Invalid schema response", file=sys.stderr)
         sys.exit(1)
@@ -75,15 +144,31 @@ def invoke_handler(platform: Type[Platform], target: Target, kwargs: Mapping):
             print("Schema:")
             print(_json_dump(schema_response.schema))
             print()
-        if schema_response.instructions:
-            print(textwrap.fill(schema_response.instructions.rstrip()))
-        prompt_kwargs = {}
-        if step == 1:
-            prompt_kwargs["set_values"] = set_values
-        value = prompt(schema_response.schema, set_values=set_values)
+        # the set values are for the first step's schema, so skip prompting
+        # only if they're already a valid payload for it
+        if step > 1:
+            error = "the service requested more input"
+        elif set_values or no_input:
+            value, error = _get_complete_value(schema_response.schema, set_values)
+        else:
+            error = "no values set"
+        if error and no_input:
+            print(f"Cannot invoke without input: {error}", file=sys.stderr)
+            sys.exit(1)
+        if error:
+            if schema_response.instructions:
+                print(textwrap.fill(schema_response.instructions.rstrip()))
+            prompt_kwargs = {}
+            if step == 1:
+                prompt_kwargs["set_values"] = set_values
+            with profiling.phase("preprocess"):
+                schema = preprocess_schema(schema_response.schema)
+            with profiling.phase("prompt"):
+                value = prompt(schema, **prompt_kwargs)
         # print(f"prompt result: {json.dumps(value, indent=2)}")
         # print("base", schema_response.base, "path", schema_response.path)
-        payload = combine(schema_response.base, schema_response.path, value)
+        with profiling.phase("combine"):
+            payload = combine(schema_response.base, schema_response.path, value)
         invoke_request = InvocationRequest(
             payload=payload, client=CLIENT, state=schema_response.state
         )
@@ -92,10 +177,11 @@ def invoke_handler(platform: Type[Platform], target: Target, kwargs: Mapping):
             print("Invocation request:")
             print(target.invoke_request_to_str(invoke_request, _json_dump))
         try:
-            invoke_response = target.invoke(invoke_request)
+            with profiling.phase("invoke"):
+                invoke_response = target.invoke(invoke_request)
             if isinstance(invoke_response, ErrorResponse):
                 print(f"Error: {invoke_response.error_message}")
-                if invoke_response.schema:
+                if invoke_response.schema and not no_input:
                     schema_response = invoke_response.to_schema_response()
                     continue
                 else:
@@ -1,10 +1,22 @@
+import sys
 from itertools import zip_longest
 import textwrap
 from typing import Iterable, Mapping, Tuple
 
 import click
 
+from .types import SchemaRequest
 from .platform import Target
+from .sweep import sweep, sweep_async, write_catalog
+
+from . import __version__
+
+CLIENT = f"api-concierge-cli {__version__}"
+
+DEFAULT_CONCURRENCY = 8
+
+# options that only apply to --with-schema
+SWEEP_OPTIONS = ["concurrency", "catalog", "asyncio"]
 
 
 def fill(lines: list, length: int, width: int):
@@ -25,10 +37,47 @@ def get_widths(total: int) -> Tuple[int, int, int]:
 
 
 def add_global_list_options(list_command: click.Command):
-    # list_command.params.append(click.Option(["--foo"]))
-    pass
+    list_command.params.append(click.Option(["--with-schema"], is_flag=True,
+        help="Request the schema from every target and report its hash, validity, and latency."))
+    list_command.params.append(click.Option(["--concurrency"], type=click.IntRange(min=1),
+        show_default=str(DEFAULT_CONCURRENCY), help="Maximum concurrent schema requests with --with-schema."))
+    list_command.params.append(click.Option(["--catalog"], metavar="FILE",
+        type=click.Path(dir_okay=False, writable=True),
+        help="With --with-schema, write all schemas to FILE."))
+    list_command.params.append(click.Option(["--asyncio"], is_flag=True,
+        help="With --with-schema, multiplex requests on an event loop instead of threads."))
+
+def sweep_handler(targets: Iterable[Target], kwargs: Mapping):
+    schema_request = SchemaRequest(client=CLIENT)
+    name_width = 60
+    results = []
+    invalid = 0
+    sweep_func = sweep_async if kwargs.get("asyncio") else sweep
+    for result in sweep_func(targets, schema_request, kwargs.get("concurrency") or DEFAULT_CONCURRENCY):
+        results.append(result)
+        name = result.name.ljust(name_width)
+        latency = f"{result.latency * 1000:8.1f}ms"
+        record = result.record
+        if record and record.attempts > 1:
+            # e.g., "2/3h": the second of three attempts answered, and it was a hedge
+            latency += f" {record.winner}/{record.attempts}{'h' if record.hedged else ''}"
+        if result.valid:
+            print(f"{name} valid   {result.schema_hash[:19]} {latency}")
+        else:
+            invalid += 1
+            print(f"{name} INVALID {'':19} {latency}  {result.error}")
+    if kwargs.get("catalog"):
+        write_catalog(kwargs["catalog"], results)
+    if invalid:
+        sys.exit(1)
 
 def list_handler(targets: Iterable[Target], kwargs: Mapping):
+    if kwargs.get("with_schema"):
+        return sweep_handler(targets, kwargs)
+    for name in SWEEP_OPTIONS:
+        if kwargs.get(name):
+            raise click.UsageError(f"--{name} requires --with-schema")
+
     name_width, description_width = get_widths(120)
 
     name_wrapper = textwrap.TextWrapper(
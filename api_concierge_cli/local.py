@@ -0,0 +1,270 @@
+"""Run handlers locally, without deploying them.
+
+Handlers are given as module:function and are called with a Lambda-style
+(event, context) signature, speaking the same payload-mode protocol as Lambda.
+They run in-process by default, or in a reusable pool of worker processes
+with --isolate. Events and responses go through JSON either way, so handlers
+see what they would see when deployed."""
+
+import importlib
+import inspect
+import itertools
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Type, Union, Any
+
+import click
+
+from . import codec
+from .types import (
+    InvocationRequest,
+    SchemaRequest,
+    SchemaResponse,
+    ErrorResponse,
+    load_invocation_response,
+)
+from .platform import RequestError, Target, Platform
+
+DEFAULT_TIMEOUT = 900
+
+_HANDLERS = {}  # type: Dict[str, Callable]
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+_STDOUT_LOCK = threading.Lock()
+
+
+class LocalContext:
+    def __init__(self, function_name: str, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.function_name = function_name
+        self.function_version = "$LATEST"
+        self.invoked_function_arn = f"arn:aws:lambda:local:000000000000:function:{function_name}"
+        self.memory_limit_in_mb = 128
+        self.aws_request_id = str(uuid.uuid4())
+        self.log_group_name = f"/aws/lambda/{function_name}"
+        self.log_stream_name = "local"
+        self._deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def _add_paths(paths: Sequence[str]) -> None:
+    for path in reversed(paths):
+        path = os.path.abspath(path)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def _load_handler(spec: str) -> Callable:
+    if spec not in _HANDLERS:
+        module_name, sep, function_name = spec.partition(":")
+        if not sep or not module_name or not function_name:
+            raise ValueError(f"Handler {spec!r} must be in the form module:function")
+        module = importlib.import_module(module_name)
+        try:
+            _HANDLERS[spec] = getattr(module, function_name)
+        except AttributeError:
+            raise ValueError(f"Module {module_name} has no function {function_name}")
+    return _HANDLERS[spec]
+
+
+class _HandlerStdout:
+    """Stands in for stdout, sending what handlers print to stderr, as Lambda
+    sends it to the function's logs, while the CLI's own output stays on
+    stdout. Handlers may be running on several threads at once."""
+
+    def __init__(self, stdout: Any) -> None:
+        self.stdout = stdout
+        self.local = threading.local()
+
+    def _get_stream(self) -> Any:
+        return sys.stderr if getattr(self.local, "in_handler", False) else self.stdout
+
+    def write(self, data: str) -> int:
+        return self._get_stream().write(data)
+
+    def flush(self) -> None:
+        self._get_stream().flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_stream(), name)
+
+
+def _get_handler_stdout() -> _HandlerStdout:
+    with _STDOUT_LOCK:
+        if not isinstance(sys.stdout, _HandlerStdout):
+            sys.stdout = _HandlerStdout(sys.stdout)
+        return sys.stdout
+
+
+def _run_handler(spec: str, paths: Sequence[str], payload: bytes) -> Tuple[bool, Any]:
+    """Returns (True, response bytes), or (False, (error type, error message))
+    if the handler raised, mirroring a Lambda function error."""
+    _add_paths(paths)
+    stdout = _get_handler_stdout()
+    stdout.local.in_handler = True
+    try:
+        handler = _load_handler(spec)
+        function_name = spec.partition(":")[2]
+        response = handler(codec.loads(payload), LocalContext(function_name))
+        return True, codec.dumps_bytes(response)
+    except KeyboardInterrupt:
+        raise
+    except BaseException as e:
+        # including SystemExit, which would otherwise end the CLI (or a worker)
+        return False, (type(e).__name__, str(e))
+    finally:
+        stdout.local.in_handler = False
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor()
+        return _POOL
+
+
+def _reset_pool(pool: ProcessPoolExecutor) -> None:
+    global _POOL
+    with _POOL_LOCK:
+        # another thread may have replaced it already
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False)
+
+
+class LocalTarget(Target):
+    def __init__(
+        self,
+        *,
+        handler: str,
+        paths: Sequence[str] = (),
+        isolate: bool = False,
+        description: Optional[str] = None,
+    ) -> None:
+        self.handler = handler
+        self.paths = list(paths)
+        self.isolate = isolate
+        self._description = description
+
+    def get_name(self) -> str:
+        return self.handler
+
+    def get_description(self) -> Optional[str]:
+        return self._description
+
+    def search_for_schema(self) -> Optional[SchemaResponse]:
+        return None
+
+    def _invoke_function(self, payload: bytes) -> Any:
+        if self.isolate:
+            pool = _get_pool()
+            try:
+                ok, result = pool.submit(_run_handler, self.handler, self.paths, payload).result()
+            except BrokenProcessPool as e:
+                # a worker exited or crashed (e.g., os._exit or a segfault),
+                # which breaks the whole pool; the next request gets a new one
+                _reset_pool(pool)
+                raise RequestError(f"Error Unhandled Runtime.ExitError: worker process exited: {e}") from e
+        else:
+            ok, result = _run_handler(self.handler, self.paths, payload)
+        if not ok:
+            error_type, error_message = result
+            raise RequestError(f"Error Unhandled {error_type}: {error_message}")
+        return codec.loads(result)
+
+    def request_schema(self, request: SchemaRequest) -> SchemaResponse:
+        response_payload = self._invoke_function(request.get_payload_bytes())
+        return SchemaResponse.load_from_payload(response_payload)
+
+    def invoke(
+        self, request: InvocationRequest
+    ) -> Union[SchemaResponse, ErrorResponse, Any]:
+        response_payload = self._invoke_function(request.get_payload_bytes())
+        return load_invocation_response(response_payload)
+
+    def invoke_request_to_str(self, request: InvocationRequest, json_dump_func: Callable[[Any], str]) -> str:
+        return json_dump_func(request.get_payload())
+
+    def invoke_response_to_str(self, response: Any, json_dump_func: Callable[[Any], str]) -> str:
+        return json_dump_func(response)
+
+
+def _target_options(f):
+    f = click.option("--isolate", is_flag=True,
+        help="Run the handler in a worker process instead of in-process.")(f)
+    f = click.option("--path", "paths", multiple=True, metavar="DIR",
+        type=click.Path(exists=True, file_okay=False),
+        help="Directory to import handlers from; defaults to the current directory.")(f)
+    return f
+
+
+class LocalPlatform(Platform):
+
+    @classmethod
+    def get_name(cls) -> str:
+        return "local"
+
+    @classmethod
+    def get_list_command(cls, handler: Callable[[Iterable[Target], Mapping], None]) -> click.Command:
+        @click.command()
+        @click.argument("modules", nargs=-1, required=True)
+        @_target_options
+        def command(modules, paths, isolate, **kwargs):
+            paths = list(paths) or [os.getcwd()]
+            _add_paths(paths)
+            iters = [cls._iter_module(module, paths, isolate) for module in modules]
+            handler(itertools.chain(*iters), kwargs)
+
+        return command
+
+    @classmethod
+    def get_invoke_command(cls, handler: Callable[[Type["Platform"], Target, Mapping], None]) -> click.Command:
+        @click.command()
+        @click.argument("handler_spec", metavar="MODULE:FUNCTION")
+        @_target_options
+        def command(handler_spec, paths, isolate, **kwargs):
+            target = LocalTarget(handler=handler_spec, paths=list(paths) or [os.getcwd()], isolate=isolate)
+            handler(cls, target, kwargs)
+
+        return command
+
+    @classmethod
+    def get_get_schema_command(cls, handler: Callable[[Type["Platform"], Target, Mapping], None]) -> click.Command:
+        @click.command()
+        @click.argument("handler_spec", metavar="MODULE:FUNCTION")
+        @_target_options
+        def command(handler_spec, paths, isolate, **kwargs):
+            target = LocalTarget(handler=handler_spec, paths=list(paths) or [os.getcwd()], isolate=isolate)
+            handler(cls, target, kwargs)
+
+        return command
+
+    @classmethod
+    def _iter_module(cls, module_name: str, paths: List[str], isolate: bool):
+        # every public function defined in the module that takes (event, context)
+        module = importlib.import_module(module_name)
+        for name, value in inspect.getmembers(module, inspect.isfunction):
+            if name.startswith("_") or value.__module__ != module.__name__:
+                continue
+            try:
+                inspect.signature(value).bind(None, None)
+            except TypeError:
+                continue
+            description = None
+            if value.__doc__:
+                description = inspect.cleandoc(value.__doc__).splitlines()[0]
+            yield LocalTarget(
+                handler=f"{module_name}:{name}", paths=paths, isolate=isolate, description=description
+            )
+
+
+PLATFORMS = [LocalPlatform]
@@ -1,4 +1,6 @@
-from typing import Callable, Dict, List, Mapping, Optional, Any, Sequence, Union, cast, Type, Iterable
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Mapping, Optional, Any, Sequence, Tuple, Union, cast, Type, Iterable
 
 import click
 
@@ -7,6 +9,60 @@ from .types import SchemaRequest, SchemaResponse, InvocationRequest, ErrorRespon
 class RequestError(Exception):
     pass
 
+class TransientRequestError(RequestError):
+    """The request failed in a way that may succeed if retried."""
+    pass
+
+class ThrottlingError(TransientRequestError):
+    pass
+
+class ConnectionFailedError(TransientRequestError):
+    """The request was never delivered, so it is safe to retry even if it is not idempotent."""
+    pass
+
+@dataclass(frozen=True)
+class RequestPolicy:
+    """Deadlines are in seconds. Timeouts apply to a single attempt, deadlines
+    to a whole request including retries. Schema requests are idempotent, so
+    they are retried on any transient error and may be hedged: if the first
+    attempt has not answered within hedge_after seconds, a second is sent and
+    whichever answers first is used. Invocations are only retried when the
+    request was never delivered or was throttled. Callers that handle
+    throttling themselves, like the list sweep, can turn off retrying it."""
+    connect_timeout: float = 10.0
+    schema_timeout: float = 30.0
+    invoke_timeout: float = 60.0
+    schema_deadline: Optional[float] = None
+    invoke_deadline: Optional[float] = None
+    max_attempts: int = 3
+    backoff_base: float = 0.2
+    backoff_max: float = 5.0
+    hedge_after: Optional[float] = None
+    retry_throttling: bool = True
+
+    def get_retry_delay(self, error: Exception, attempt: int, elapsed: float, deadline: Optional[float],
+            retryable: Tuple[Type[Exception], ...]) -> Optional[float]:
+        """Seconds to wait before retrying a request after the given attempt
+        failed with error, or None if the error should be raised."""
+        if not isinstance(error, retryable):
+            return None
+        if isinstance(error, ThrottlingError) and not self.retry_throttling:
+            return None
+        if attempt >= self.max_attempts:
+            return None
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if deadline is not None and elapsed + backoff >= deadline:
+            return None
+        return backoff
+
+@dataclass(frozen=True)
+class RequestRecord:
+    phase: str
+    attempts: int
+    winner: int
+    hedged: bool
+    latency: float
+
 class Target:
     def get_name(self) -> str:
         raise NotImplementedError
@@ -25,12 +81,64 @@ class Target:
     ) -> Union[SchemaResponse, ErrorResponse, Any]:
         raise NotImplementedError
 
+    def get_last_request_record(self) -> Optional[RequestRecord]:
+        return None
+
     def invoke_request_to_str(self, request: InvocationRequest, json_dump_func: Callable[[Any], str]) -> str:
         raise NotImplementedError
 
     def invoke_response_to_str(self, response: Any, json_dump_func: Callable[[Any], str]) -> str:
         raise NotImplementedError
 
+    def as_async(self) -> "AsyncTarget":
+        """Targets with a native async transport should override this; by
+        default requests run on the event loop's thread pool."""
+        return ThreadedAsyncTarget(self)
+
+class AsyncTarget:
+    def get_name(self) -> str:
+        raise NotImplementedError
+
+    def get_description(self) -> Optional[str]:
+        raise NotImplementedError
+
+    async def request_schema(self, request: SchemaRequest) -> SchemaResponse:
+        raise NotImplementedError
+
+    async def invoke(
+        self, request: InvocationRequest
+    ) -> Union[SchemaResponse, ErrorResponse, Any]:
+        raise NotImplementedError
+
+    def get_last_request_record(self) -> Optional[RequestRecord]:
+        return None
+
+    async def aclose(self) -> None:
+        pass
+
+class ThreadedAsyncTarget(AsyncTarget):
+    def __init__(self, target: Target) -> None:
+        self.target = target
+
+    def get_name(self) -> str:
+        return self.target.get_name()
+
+    def get_description(self) -> Optional[str]:
+        return self.target.get_description()
+
+    async def request_schema(self, request: SchemaRequest) -> SchemaResponse:
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(None, self.target.request_schema, request)
+
+    async def invoke(
+        self, request: InvocationRequest
+    ) -> Union[SchemaResponse, ErrorResponse, Any]:
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(None, self.target.invoke, request)
+
+    def get_last_request_record(self) -> Optional[RequestRecord]:
+        return self.target.get_last_request_record()
+
 class Platform:
 
     @classmethod
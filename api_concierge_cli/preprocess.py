@@ -0,0 +1,186 @@
+"""Schema preprocessing before prompting.
+
+Schemas generated from models often have many definitions and deep $ref
+chains. Local refs are resolved once here, rather than repeatedly while
+prompting; definitions that are no longer referenced are dropped. Refs that
+form a cycle can't be inlined, so they're left in place along with the
+definitions they point to.
+
+Results are memoized by the schema's content hash (not a hash from the
+service, which is only meaningful to that service), in memory across steps
+and on disk across sessions."""
+
+import hashlib
+import os
+from typing import Any, Dict, Set
+from urllib.parse import unquote
+
+import jsonpointer
+
+from . import codec
+from .cache import get_cache_dir, write_file
+from .types import get_schema_hash
+
+# bump when the output changes, to invalidate what's cached on disk
+VERSION = 2
+
+DEFINITIONS_KEYWORDS = ("definitions", "$defs")
+
+# values of these keywords are data, not schemas, so they aren't searched for refs
+DATA_KEYWORDS = ("enum", "const", "default", "examples")
+
+# values of these keywords map names to schemas, so their keys aren't keywords
+# (a property can be named "default")
+SCHEMA_MAP_KEYWORDS = ("properties", "patternProperties", "definitions", "$defs", "dependentSchemas", "dependencies")
+
+# keywords next to a $ref that are kept when it's inlined, since they're
+# useful for prompting; other siblings are ignored in draft-07 and earlier
+ANNOTATION_KEYWORDS = ("title", "description", "$comment", "default", "examples", "readOnly", "writeOnly")
+
+LEGACY_DRAFTS = ("draft-04", "draft-06", "draft-07")
+
+_MEMO = {}  # type: Dict[str, Any]
+
+
+class _Dereferencer:
+    def __init__(self, root: dict) -> None:
+        self.root = root
+        self.resolved = {}  # type: Dict[str, Any]
+        self.in_progress = set()  # type: Set[str]
+        self.retained = set()  # type: Set[str]
+        schema_uri = root.get("$schema", "")
+        self.legacy = not schema_uri or any(draft in schema_uri for draft in LEGACY_DRAFTS)
+
+    def run(self) -> Any:
+        self.in_progress.add("#")
+        output = self._walk({
+            key: value for key, value in self.root.items() if key not in DEFINITIONS_KEYWORDS
+        })
+        self.in_progress.remove("#")
+        self.resolved["#"] = output
+
+        # put back the definitions that cyclic refs still point to; the output
+        # may be a resolved definition itself (when the root is a $ref), so
+        # copy along the way rather than adding the definitions to it
+        if not isinstance(output, dict):
+            return output
+        output = dict(output)
+        for ref in sorted(self.retained):
+            parts = jsonpointer.JsonPointer(unquote(ref[1:])).parts
+            if not parts or parts[0] not in DEFINITIONS_KEYWORDS:
+                continue
+            container = output
+            for part in parts[:-1]:
+                child = container.get(part)
+                container[part] = dict(child) if isinstance(child, dict) else {}
+                container = container[part]
+            container[parts[-1]] = self.resolved[ref]
+        return output
+
+    def _walk_value(self, key: str, value: Any) -> Any:
+        if key in DATA_KEYWORDS:
+            return value
+        if key in SCHEMA_MAP_KEYWORDS and isinstance(value, dict):
+            return {name: self._walk(subschema) for name, subschema in value.items()}
+        return self._walk(value)
+
+    def _walk(self, node: Any) -> Any:
+        if isinstance(node, list):
+            return [self._walk(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith("#"):
+            return self._inline(ref, node)
+        return {key: self._walk_value(key, value) for key, value in node.items()}
+
+    def _inline(self, ref: str, node: dict) -> Any:
+        resolved = self._resolve(ref)
+        siblings = {key: value for key, value in node.items() if key != "$ref"}
+        if not siblings or not isinstance(resolved, dict):
+            return resolved
+        annotations = {key: value for key, value in siblings.items() if key in ANNOTATION_KEYWORDS}
+        others = {key: value for key, value in siblings.items() if key not in ANNOTATION_KEYWORDS}
+        if others and not self.legacy:
+            # siblings of $ref apply alongside it after draft-07
+            output = {key: self._walk_value(key, value) for key, value in others.items()}
+            output["allOf"] = output.get("allOf", []) + [resolved]
+            output.update(annotations)
+            return output
+        output = dict(resolved)
+        output.update(annotations)
+        return output
+
+    def _resolve(self, ref: str) -> Any:
+        if ref in self.resolved:
+            return self.resolved[ref]
+        if ref in self.in_progress:
+            self.retained.add(ref)
+            return {"$ref": ref}
+        try:
+            target = jsonpointer.resolve_pointer(self.root, unquote(ref[1:]))
+        except jsonpointer.JsonPointerException:
+            # not a pointer (e.g., a named anchor), or doesn't resolve; leave it
+            return {"$ref": ref}
+        self.in_progress.add(ref)
+        try:
+            output = self._walk(target)
+        finally:
+            self.in_progress.remove(ref)
+        self.resolved[ref] = output
+        return output
+
+
+def _has_nested_ids(node: Any, top: bool = True) -> bool:
+    if isinstance(node, list):
+        return any(_has_nested_ids(item, False) for item in node)
+    if not isinstance(node, dict):
+        return False
+    if not top and isinstance(node.get("$id"), str):
+        return True
+    for key, value in node.items():
+        if key in DATA_KEYWORDS:
+            continue
+        subschemas = value.values() if key in SCHEMA_MAP_KEYWORDS and isinstance(value, dict) else [value]
+        if any(_has_nested_ids(subschema, False) for subschema in subschemas):
+            return True
+    return False
+
+
+def dereference(schema: Any) -> Any:
+    """Inline local refs and drop unreferenced definitions, without memoizing."""
+    if not isinstance(schema, dict):
+        return schema
+    if _has_nested_ids(schema):
+        # nested $ids change the base URI for refs; leave those for the prompter
+        return schema
+    try:
+        return _Dereferencer(schema).run()
+    except RecursionError:
+        # extremely deep nesting; the prompter will have to resolve refs as it goes
+        return schema
+
+
+def _get_cache_path(schema_hash: str) -> str:
+    key = hashlib.sha256(f"{VERSION}:{schema_hash}".encode("utf-8")).hexdigest()
+    return os.path.join(get_cache_dir(), "preprocessed", f"{key}.json")
+
+
+def preprocess_schema(schema: Any) -> Any:
+    if not isinstance(schema, dict):
+        return schema
+    schema_hash = get_schema_hash(schema)
+    if schema_hash in _MEMO:
+        return _MEMO[schema_hash]
+    path = _get_cache_path(schema_hash)
+    try:
+        with open(path, "rb") as fp:
+            result = codec.loads(fp.read())
+    except (OSError, ValueError):
+        result = dereference(schema)
+        try:
+            write_file(path, codec.dumps_bytes(result))
+        except OSError:
+            pass
+    _MEMO[schema_hash] = result
+    return result
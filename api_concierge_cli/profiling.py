@@ -0,0 +1,109 @@
+"""Opt-in CPU and memory profiling of CLI sessions.
+
+Nothing here is imported or enabled unless requested with --profile-cpu or
+--profile-mem; when disabled, phase() is a shared no-op context manager."""
+
+import contextlib
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+TOP_SITES = 5
+
+_memory_profile = None
+
+def start_cpu_profile(path: str) -> Callable[[], None]:
+    """Start profiling and return a function that stops it and writes pstats to path."""
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    def stop():
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"CPU profile written to {path}", file=sys.stderr)
+    return stop
+
+class _MemoryProfile:
+    def __init__(self) -> None:
+        # phase name -> (peak bytes, whether the peak is exact, seconds, top allocation sites)
+        self.phases = {}  # type: Dict[str, tuple]
+        # phases reset tracemalloc's peak, so the session's peak is kept here
+        self.peak = 0
+
+    def update_peak(self, peak: int) -> None:
+        self.peak = max(self.peak, peak)
+
+    def record(self, name: str, peak: int, exact: bool, seconds: float, sites: List[str]) -> None:
+        if name not in self.phases or peak > self.phases[name][0]:
+            self.phases[name] = (peak, exact, seconds, sites)
+
+def start_memory_profile() -> Callable[[], None]:
+    """Start tracing allocations and return a function that stops and prints a report."""
+    global _memory_profile
+    import tracemalloc
+    tracemalloc.start()
+    _memory_profile = _MemoryProfile()
+    def stop():
+        global _memory_profile
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _memory_profile.update_peak(peak)
+        print(f"Peak traced memory: {_format_size(_memory_profile.peak)}", file=sys.stderr)
+        for name, (phase_peak, exact, seconds, sites) in _memory_profile.phases.items():
+            label = "peak" if exact else "peak at least"
+            print(f"  {name}: {label} {_format_size(phase_peak)} in {seconds * 1000:.0f}ms", file=sys.stderr)
+            for site in sites:
+                print(f"    {site}", file=sys.stderr)
+        _memory_profile = None
+    return stop
+
+def phase(name: str):
+    """Context manager marking a phase of the session for the memory report."""
+    if _memory_profile is None:
+        return _NULL_CONTEXT
+    return _memory_phase(name)
+
+@contextlib.contextmanager
+def _memory_phase(name: str):
+    import tracemalloc
+    before = tracemalloc.take_snapshot()
+    start_current, start_peak = tracemalloc.get_traced_memory()
+    _memory_profile.update_peak(start_peak)
+    can_reset_peak = hasattr(tracemalloc, "reset_peak")
+    if can_reset_peak:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        _memory_profile.update_peak(peak)
+        after = tracemalloc.take_snapshot().filter_traces(_snapshot_filters())
+        sites = []
+        for stat in after.compare_to(before.filter_traces(_snapshot_filters()), "lineno")[:TOP_SITES]:
+            if stat.size_diff <= 0:
+                break
+            frame = stat.traceback[0]
+            sites.append(f"{frame.filename}:{frame.lineno}: {_format_size(stat.size_diff)}")
+        # without reset_peak (before Python 3.9), the peak is the session's,
+        # which only belongs to this phase if it was reached during it
+        exact = can_reset_peak or peak > start_peak
+        phase_peak = peak - start_current if exact else current - start_current
+        _memory_profile.record(name, max(phase_peak, current - start_current), exact, seconds, sites)
+
+def _snapshot_filters():
+    import tracemalloc
+    return [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ]
+
+def _format_size(size: int) -> str:
+    for unit in ["B", "KiB", "MiB"]:
+        if abs(size) < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GiB"
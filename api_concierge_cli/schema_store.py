@@ -0,0 +1,124 @@
+"""Content-addressed local store of schemas, for conditional schema requests.
+
+Schemas are stored once under their content hash, however many targets share
+them. Hashes given by services are opaque, and only meaningful for the
+service that sent them, so each target's index maps the hashes it has
+returned to the content hashes of the schemas; the former are sent with its
+schema requests."""
+
+import dataclasses
+import hashlib
+import os
+from typing import Any, Callable, Generator, List, Optional
+
+from . import codec
+from .cache import get_cache_dir, write_file
+from .types import SchemaRequest, SchemaResponse, InvalidSchemaResponseError, get_schema_hash
+
+MAX_KNOWN_HASHES = 4
+
+def _file_name(value: str) -> str:
+    # target ids and hashes can contain anything, so don't use them as paths directly
+    return hashlib.sha256(value.encode("utf-8")).hexdigest() + ".json"
+
+class SchemaStore:
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = directory or os.path.join(get_cache_dir(), "schemas")
+
+    def _schema_path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, "objects", _file_name(content_hash))
+
+    def _index_path(self, target_id: str) -> str:
+        return os.path.join(self.directory, "targets", _file_name(target_id))
+
+    def get(self, content_hash: str) -> Optional[Any]:
+        try:
+            with open(self._schema_path(content_hash), "rb") as fp:
+                return codec.loads(fp.read())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, schema: Any) -> str:
+        """Store a schema, returning its content hash."""
+        content_hash = get_schema_hash(schema)
+        path = self._schema_path(content_hash)
+        if not os.path.exists(path):
+            try:
+                write_file(path, codec.dumps_bytes(schema))
+            except OSError:
+                pass
+        return content_hash
+
+    def _read_index(self, target_id: str) -> List[List[str]]:
+        # entries are [hash given by the target, content hash], most recent first
+        try:
+            with open(self._index_path(target_id), "rb") as fp:
+                entries = codec.loads(fp.read())
+        except (OSError, ValueError):
+            return []
+        if not isinstance(entries, list):
+            return []
+        return [e for e in entries if isinstance(e, list) and len(e) == 2]
+
+    def get_known_hashes(self, target_id: str) -> List[str]:
+        return [schema_hash for schema_hash, _ in self._read_index(target_id)]
+
+    def add_known_hash(self, target_id: str, schema_hash: str, content_hash: str) -> None:
+        # a few are kept so a target flipping between versions (e.g., during
+        # a deploy) still gets not-modified responses
+        entries = self._read_index(target_id)
+        entry = [schema_hash, content_hash]
+        if entries[:1] == [entry]:
+            return
+        entries = [entry] + [e for e in entries if e[0] != schema_hash]
+        try:
+            write_file(self._index_path(target_id), codec.dumps_bytes(entries[:MAX_KNOWN_HASHES]))
+        except OSError:
+            pass
+
+    def _get_content_hash(self, target_id: str, schema_hash: str) -> Optional[str]:
+        for known_hash, content_hash in self._read_index(target_id):
+            if known_hash == schema_hash:
+                return content_hash
+        return None
+
+    def resolve(self, target_id: str, response: SchemaResponse) -> Optional[SchemaResponse]:
+        """Fill in the schema of a not-modified response from the store, or
+        store the schema of a full response. Returns None if the response is
+        not-modified but the target's schema for that hash is no longer in
+        the store."""
+        if response.is_not_modified:
+            content_hash = self._get_content_hash(target_id, response.schema_hash)
+            schema = self.get(content_hash) if content_hash else None
+            if schema is None:
+                return None
+            return dataclasses.replace(response, schema=schema)
+        content_hash = self.put(response.schema)
+        schema_hash = response.schema_hash or content_hash
+        self.add_known_hash(target_id, schema_hash, content_hash)
+        return dataclasses.replace(response, schema_hash=schema_hash)
+
+    def iter_requests(self, target_id: str,
+            request: SchemaRequest) -> Generator[SchemaRequest, SchemaResponse, SchemaResponse]:
+        """Conditional schema requests for a target. Send the response to
+        each request yielded; the resolved response is returned. Async
+        callers drive this directly; sync callers can use request()."""
+        request = dataclasses.replace(request, schema_hashes=tuple(self.get_known_hashes(target_id)))
+        schema_response = self.resolve(target_id, (yield request))
+        if schema_response is None and request.schema_hashes:
+            # not modified, but we no longer have the schema
+            request = dataclasses.replace(request, schema_hashes=())
+            schema_response = self.resolve(target_id, (yield request))
+        if schema_response is None:
+            raise InvalidSchemaResponseError
+        return schema_response
+
+    def request(self, target_id: str, request: SchemaRequest,
+            send: Callable[[SchemaRequest], SchemaResponse]) -> SchemaResponse:
+        requests = self.iter_requests(target_id, request)
+        try:
+            request = next(requests)
+            while True:
+                request = requests.send(send(request))
+        except StopIteration as e:
+            return e.value
@@ -0,0 +1,309 @@
+import asyncio
+import contextlib
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, ContextManager, Deque, Iterable, Iterator, Optional, Tuple, Union
+
+import jsonschema
+
+from .types import (
+    SchemaRequest,
+    SchemaResponse,
+    InvalidSchemaError,
+    InvalidSchemaResponseError,
+    get_schema_hash,
+)
+
+from .platform import Target, AsyncTarget, RequestError, RequestRecord, ThrottlingError
+from . import codec
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+# errors that make a target's result invalid, rather than failing the sweep
+SWEEP_ERRORS = (RequestError, InvalidSchemaResponseError, InvalidSchemaError, ValueError)
+
+MAX_THROTTLE_RETRIES = 6
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 10.0
+
+@dataclass(frozen=True)
+class SweepResult:
+    name: str
+    valid: bool
+    latency: float
+    schema_hash: Optional[str] = None
+    schema: Optional[Any] = None
+    error: Optional[str] = None
+    throttled: int = 0
+    # how the successful request went, if the target keeps a record
+    record: Optional[RequestRecord] = None
+
+
+class _AIMDLimiter:
+    """Concurrency limit that halves on throttling and grows back by one
+    after a run of successes (AIMD). Subclasses provide acquire(), the lock
+    the bookkeeping is done under, and how waiters are woken."""
+
+    def __init__(self, max_limit: int) -> None:
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self._successes = 0
+
+    def _locked(self) -> ContextManager:
+        raise NotImplementedError
+
+    def _notify(self) -> None:
+        raise NotImplementedError
+
+    def release(self) -> None:
+        with self._locked():
+            self.in_flight -= 1
+            self._notify()
+
+    def on_success(self) -> None:
+        with self._locked():
+            self._successes += 1
+            if self.limit < self.max_limit and self._successes >= self.limit:
+                self._successes = 0
+                self.limit += 1
+                self._notify()
+
+    def on_throttle(self) -> None:
+        with self._locked():
+            self._successes = 0
+            self.limit = max(1, self.limit // 2)
+
+
+class AdaptiveLimiter(_AIMDLimiter):
+    """AIMD concurrency limit for threads."""
+
+    def __init__(self, max_limit: int) -> None:
+        super().__init__(max_limit)
+        self._condition = threading.Condition()
+
+    def _locked(self) -> ContextManager:
+        return self._condition
+
+    def _notify(self) -> None:
+        self._condition.notify_all()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _check_schema(schema: Any) -> Optional[str]:
+    if not isinstance(schema, (dict, bool)):
+        return f"Schema is of type {type(schema).__name__}, must be object or boolean"
+    try:
+        jsonschema.validators.validator_for(schema).check_schema(schema)
+    except jsonschema.exceptions.SchemaError as e:
+        return f"Invalid schema: {e.message}"
+    return None
+
+
+def _get_error_result(name: str, error: Exception, latency: float, throttled: int) -> SweepResult:
+    if isinstance(error, ThrottlingError):
+        message = f"Throttled: {error}"
+    elif isinstance(error, InvalidSchemaResponseError):
+        message = "Invalid schema response"
+    elif isinstance(error, InvalidSchemaError):
+        message = "Invalid schema"
+    else:
+        message = str(error)
+    return SweepResult(name=name, valid=False, latency=latency, error=message, throttled=throttled)
+
+
+def _get_result(name: str, schema_response: SchemaResponse, latency: float, throttled: int,
+        record: Optional[RequestRecord]) -> SweepResult:
+    schema = schema_response.schema
+    error = _check_schema(schema)
+    return SweepResult(
+        name=name,
+        valid=error is None,
+        latency=latency,
+        # the content hash, as hashes from different targets can't be compared
+        schema_hash=get_schema_hash(schema),
+        schema=schema,
+        error=error,
+        throttled=throttled,
+        record=record,
+    )
+
+
+def _after_attempt(target: Union[Target, AsyncTarget], schema_response: Optional[SchemaResponse],
+        error: Optional[Exception], latency: float, throttled: int,
+        limiter: _AIMDLimiter) -> Tuple[Optional[SweepResult], int]:
+    """The result of a target's sweep after an attempt, or None if it should
+    be retried after a backoff; and the number of times it's been throttled."""
+    name = target.get_name()
+    if error is None:
+        limiter.on_success()
+        result = _get_result(name, schema_response, latency, throttled, target.get_last_request_record())
+        return result, throttled
+    if not isinstance(error, ThrottlingError):
+        return _get_error_result(name, error, latency, throttled), throttled
+    limiter.on_throttle()
+    throttled += 1
+    if throttled > MAX_THROTTLE_RETRIES:
+        return _get_error_result(name, error, latency, throttled), throttled
+    return None, throttled
+
+
+def _sweep_target(target: Target, request: SchemaRequest, limiter: AdaptiveLimiter) -> SweepResult:
+    throttled = 0
+    while True:
+        schema_response, error = None, None
+        limiter.acquire()
+        # only time the request, not waiting for the limiter
+        start = time.perf_counter()
+        try:
+            schema_response = target.request_schema(request)
+        except SWEEP_ERRORS as e:
+            error = e
+        finally:
+            latency = time.perf_counter() - start
+            limiter.release()
+        result, throttled = _after_attempt(target, schema_response, error, latency, throttled, limiter)
+        if result:
+            return result
+        time.sleep(_backoff(throttled))
+
+
+def sweep(targets: Iterable[Target], request: SchemaRequest, concurrency: int) -> Iterator[SweepResult]:
+    """Request the schema from every target, yielding results as they complete."""
+    limiter = AdaptiveLimiter(concurrency)
+    with ThreadPoolExecutor(max_workers=limiter.max_limit) as executor:
+        futures = set()
+        for target in targets:
+            futures.add(executor.submit(_sweep_target, target, request, limiter))
+            done = {f for f in futures if f.done()}
+            for future in done:
+                yield future.result()
+            futures -= done
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def write_catalog(path: str, results: Iterable[SweepResult]) -> None:
+    """Write an offline catalog of schemas. Schemas shared between targets
+    are stored once, keyed by hash."""
+    catalog = {"targets": {}, "schemas": {}}
+    for result in results:
+        entry = {"valid": result.valid, "latency_ms": round(result.latency * 1000, 1)}
+        if result.schema_hash:
+            entry["schema_hash"] = result.schema_hash
+            catalog["schemas"][result.schema_hash] = result.schema
+        if result.error:
+            entry["error"] = result.error
+        if result.record:
+            entry["attempts"] = result.record.attempts
+            entry["winner"] = result.record.winner
+            entry["hedged"] = result.record.hedged
+        catalog["targets"][result.name] = entry
+    with open(path, "w") as fp:
+        fp.write(codec.dumps(catalog, indent=True))
+
+
+class AsyncAdaptiveLimiter(_AIMDLimiter):
+    """AIMD concurrency limit for tasks on a single event loop."""
+
+    def __init__(self, max_limit: int) -> None:
+        super().__init__(max_limit)
+        self._waiters = deque()  # type: Deque[asyncio.Future]
+
+    def _locked(self) -> ContextManager:
+        # everything runs on the loop's thread, and nothing here awaits
+        return _NULL_CONTEXT
+
+    def _notify(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def acquire(self) -> None:
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+        self.in_flight += 1
+
+
+async def _sweep_target_async(target: AsyncTarget, request: SchemaRequest, limiter: AsyncAdaptiveLimiter) -> SweepResult:
+    throttled = 0
+    while True:
+        schema_response, error = None, None
+        await limiter.acquire()
+        # only time the request, not waiting for the limiter
+        start = time.perf_counter()
+        try:
+            schema_response = await target.request_schema(request)
+        except SWEEP_ERRORS as e:
+            error = e
+        finally:
+            latency = time.perf_counter() - start
+            limiter.release()
+        result, throttled = _after_attempt(target, schema_response, error, latency, throttled, limiter)
+        if result:
+            return result
+        await asyncio.sleep(_backoff(throttled))
+
+
+def sweep_async(targets: Iterable[Target], request: SchemaRequest, concurrency: int) -> Iterator[SweepResult]:
+    """Like sweep, but using the targets' async interfaces, multiplexed on an
+    event loop, so concurrency can be much higher than with threads."""
+    import queue
+    results = queue.Queue()
+    done = object()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        limiter = AsyncAdaptiveLimiter(concurrency)
+        iterator = iter(targets)
+        tasks = []
+        async_targets = []
+        async def sweep_target(async_target):
+            results.put(await _sweep_target_async(async_target, request, limiter))
+        try:
+            while True:
+                # discovery is synchronous (e.g., paginated API calls), so keep it off the loop
+                target = await loop.run_in_executor(None, next, iterator, None)
+                if target is None:
+                    break
+                async_target = target.as_async()
+                async_targets.append(async_target)
+                tasks.append(asyncio.ensure_future(sweep_target(async_target)))
+            await asyncio.gather(*tasks)
+        finally:
+            for async_target in async_targets:
+                await async_target.aclose()
+
+    def run_in_thread():
+        try:
+            asyncio.run(run())
+        except BaseException as e:
+            results.put(e)
+        results.put(done)
+
+    thread = threading.Thread(target=run_in_thread, daemon=True)
+    thread.start()
+    while True:
+        result = results.get()
+        if result is done:
+            break
+        if isinstance(result, BaseException):
+            raise result
+        yield result
+    thread.join()
@@ -2,6 +2,9 @@ from dataclasses import dataclass, field as dataclass_field
 from typing import Callable, Dict, List, Mapping, Optional, Any, Sequence, Union, cast, Type, Iterable
 import json
 import base64
+import hashlib
+
+from . import codec
 
 PREFIX = "x-api-concierge-"
 REQUEST_FIELD = PREFIX + "request"
@@ -13,6 +16,8 @@ ERROR_FIELD = PREFIX + "error"
 STATE_FIELD = PREFIX + "state"
 BASE_FIELD = PREFIX + "base"
 PATH_FIELD = PREFIX + "path"
+SCHEMA_HASH_FIELD = PREFIX + "schema-hash"
+SCHEMA_HASHES_FIELD = PREFIX + "schema-hashes"
 
 
 class InvalidSchemaError(Exception):
@@ -32,14 +37,20 @@ class InvalidErrorResponseError(Exception):
 
 
 def _serialize(data: Any) -> str:
-    return str(base64.urlsafe_b64encode(json.dumps(data).encode("ascii")))
+    return base64.urlsafe_b64encode(codec.dumps_bytes(data)).decode("ascii")
+
+
+def get_schema_hash(schema: Any) -> str:
+    # always stdlib, so the hash doesn't depend on which codec is installed
+    data = json.dumps(schema, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return "sha256:" + hashlib.sha256(data.encode("utf-8")).hexdigest()
 
 
 def _deserialize_schema(schema_data: Any) -> Any:
     if not isinstance(schema_data, str):
         return schema_data
     try:
-        return json.loads(base64.urlsafe_b64decode(schema_data))
+        return codec.loads(base64.urlsafe_b64decode(schema_data))
     except:
         raise InvalidSchemaError
 
@@ -47,19 +58,29 @@ def _deserialize_base(base_data: Any) -> Any:
     if not isinstance(base_data, str):
         return base_data
     try:
-        return json.loads(base64.urlsafe_b64decode(base_data))
+        return codec.loads(base64.urlsafe_b64decode(base_data))
     except:
         raise InvalidSchemaError
 
 @dataclass(frozen=True)
 class SchemaRequest:
     client: str
+    schema_hashes: Sequence[str] = ()
 
     def get_headers(self) -> Mapping[str, str]:
-        return {REQUEST_FIELD: "schema", CLIENT_FIELD: self.client}
+        headers = {REQUEST_FIELD: "schema", CLIENT_FIELD: self.client}
+        if self.schema_hashes:
+            headers[SCHEMA_HASHES_FIELD] = ",".join(self.schema_hashes)
+        return headers
 
     def get_payload(self) -> Mapping[str, Any]:
-        return {REQUEST_FIELD: "schema", CLIENT_FIELD: self.client}
+        payload = {REQUEST_FIELD: "schema", CLIENT_FIELD: self.client}
+        if self.schema_hashes:
+            payload[SCHEMA_HASHES_FIELD] = list(self.schema_hashes)
+        return payload
+
+    def get_payload_bytes(self) -> bytes:
+        return codec.dumps_bytes(self.get_payload())
 
 
 @dataclass(frozen=True)
@@ -69,9 +90,17 @@ class SchemaResponse:
     state: Optional[str] = None
     base: Optional[Any] = None
     path: Optional[str] = None
+    schema_hash: Optional[str] = None
+
+    @property
+    def is_not_modified(self) -> bool:
+        """The service omitted the schema because the client already has it."""
+        return self.schema is None and self.schema_hash is not None
 
     @classmethod
     def is_schema_response(cls, data: Mapping[str, Any]) -> bool:
+        if not isinstance(data, Mapping):
+            return False
         for data_field, data_value in data.items():
             if data_field.lower() == RESPONSE_FIELD.lower():
                 return data_value == "schema"
@@ -93,8 +122,12 @@ class SchemaResponse:
                 kwargs["base"] = _deserialize_base(header_value)
             elif header_name.lower() == PATH_FIELD.lower():
                 kwargs["path"] = header_value
+            elif header_name.lower() == SCHEMA_HASH_FIELD.lower():
+                kwargs["schema_hash"] = header_value
         if "schema" not in kwargs:
-            raise InvalidSchemaResponseError
+            if "schema_hash" not in kwargs:
+                raise InvalidSchemaResponseError
+            kwargs["schema"] = None
         return cls(**kwargs)
 
     @classmethod
@@ -113,8 +146,12 @@ class SchemaResponse:
                 kwargs["base"] = _deserialize_base(value)
             elif key.lower() == PATH_FIELD.lower():
                 kwargs["path"] = value
+            elif key.lower() == SCHEMA_HASH_FIELD.lower():
+                kwargs["schema_hash"] = value
         if "schema" not in kwargs:
-            raise InvalidSchemaResponseError
+            if "schema_hash" not in kwargs:
+                raise InvalidSchemaResponseError
+            kwargs["schema"] = None
         return cls(**kwargs)
 
 
@@ -146,6 +183,21 @@ class InvocationRequest:
         self._update_payload(payload)
         return payload
 
+    def get_payload_bytes(self) -> bytes:
+        """Encode the payload for transport, without copying it to add the
+        metadata fields. The metadata is encoded separately and spliced in."""
+        if not isinstance(self.payload, dict):
+            return codec.dumps_bytes(self.payload)
+        metadata = {}
+        self._update_payload(metadata)
+        if any(key in self.payload for key in metadata):
+            return codec.dumps_bytes(self.get_payload())
+        metadata_bytes = codec.dumps_bytes(metadata)
+        payload_bytes = codec.dumps_bytes(self.payload)
+        if payload_bytes == b"{}":
+            return metadata_bytes
+        return metadata_bytes[:-1] + b"," + payload_bytes[1:]
+
 
 @dataclass(frozen=True)
 class ErrorResponse:
@@ -167,6 +219,8 @@ class ErrorResponse:
 
     @classmethod
     def is_error_response(self, data: Mapping[str, Any]) -> bool:
+        if not isinstance(data, Mapping):
+            return False
         for data_field, data_value in data.items():
             if data_field.lower() == RESPONSE_FIELD.lower():
                 return data_value == "error"
@@ -212,3 +266,12 @@ class ErrorResponse:
             raise InvalidErrorResponseError
         return cls(**kwargs)
 
+
+def load_invocation_response(payload: Any) -> Union[SchemaResponse, ErrorResponse, Any]:
+    """Classify an invocation's response payload: a request for more input,
+    an error, or the function's own response."""
+    if SchemaResponse.is_schema_response(payload):
+        return SchemaResponse.load_from_payload(payload)
+    if ErrorResponse.is_error_response(payload):
+        return ErrorResponse.load_from_payload(payload)
+    return payload
@@ -0,0 +1,51 @@
+"""Compare the codec layer against plain stdlib json on multi-MB payloads.
+
+    python benchmarks/bench_codec.py [SIZE_MB ...]
+
+Encoding is measured the way LambdaTarget used to do it (copy the payload,
+add metadata, json.dumps to str) against InvocationRequest.get_payload_bytes.
+Decoding is measured from bytes, as read from a response stream. Speedups
+over stdlib are shown next to the codec's times; they include the codec's
+checks for values orjson would get wrong (long integers, NaN)."""
+
+import json
+import sys
+import timeit
+
+from api_concierge_cli import codec
+from api_concierge_cli.types import InvocationRequest
+
+def make_payload(size_mb: float) -> dict:
+    record = {
+        "id": 123456,
+        "name": "some record name",
+        "tags": ["alpha", "beta", "gamma"],
+        "score": 0.123456789,
+        "active": True,
+        "nested": {"a": 1, "b": [1, 2, 3], "c": None},
+    }
+    record_size = len(json.dumps(record))
+    count = int(size_mb * 1024 * 1024 / record_size)
+    return {"records": [dict(record, id=i) for i in range(count)], "note": "benchmark"}
+
+def bench(label: str, func, number: int, baseline: float = None) -> float:
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    speedup = f"  {baseline / seconds:.2f}x" if baseline else ""
+    print(f"  {label:<32} {seconds * 1000:9.2f}ms{speedup}")
+    return seconds
+
+def main(sizes) -> None:
+    print(f"codec backend: {'orjson' if codec.orjson else 'json'}")
+    for size_mb in sizes:
+        payload = make_payload(size_mb)
+        request = InvocationRequest(payload=payload, client="bench", state="state")
+        encoded = request.get_payload_bytes()
+        number = max(1, int(10 / size_mb))
+        print(f"{len(encoded) / 1024 / 1024:.1f} MB payload:")
+        baseline = bench("encode stdlib (copy + dumps)", lambda: json.dumps(request.get_payload()), number)
+        bench("encode codec (get_payload_bytes)", request.get_payload_bytes, number, baseline)
+        baseline = bench("decode stdlib", lambda: json.loads(encoded), number)
+        bench("decode codec", lambda: codec.loads(encoded), number, baseline)
+
+if __name__ == "__main__":
+    main([float(arg) for arg in sys.argv[1:]] or [1, 8, 32])
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from api_concierge_cli.aws.awslambda import LambdaTarget
+from api_concierge_cli.types import SchemaRequest
+from api_concierge_cli.platform import RequestError, RequestPolicy, ThrottlingError, TransientRequestError
+
+ARN = "arn:aws:lambda:us-east-1:123456789012:function:test"
+
+class FakeLambdaTarget(LambdaTarget):
+    """Answers from a script of (delay, result) pairs, one per request sent."""
+    def __init__(self, script, **kwargs):
+        super().__init__(session=None, function_arn=ARN, lambda_client=object(), **kwargs)
+        self.script = list(script)
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def _invoke_function(self, payload, client):
+        with self._lock:
+            self.sent += 1
+            delay, result = self.script.pop(0)
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def request(target, **kwargs):
+    return target._request("schema", b"{}", read_timeout=1, deadline=None,
+        retryable=(TransientRequestError,), **kwargs)
+
+def test_retries_transient_errors():
+    target = FakeLambdaTarget([(0, TransientRequestError()), (0, "ok")],
+        policy=RequestPolicy(backoff_base=0))
+    assert request(target, hedge=False) == "ok"
+    record = target.get_last_request_record()
+    assert (record.attempts, record.winner, record.hedged) == (2, 2, False)
+
+def test_throttling_not_retried_when_disabled():
+    target = FakeLambdaTarget([(0, ThrottlingError()), (0, "ok")],
+        policy=RequestPolicy(retry_throttling=False))
+    with pytest.raises(ThrottlingError):
+        request(target, hedge=False)
+    assert target.sent == 1
+
+def test_attempts_count_failed_hedged_round():
+    # both requests of the first, hedged round fail, then the retry answers
+    target = FakeLambdaTarget(
+        [(0.1, TransientRequestError()), (0, TransientRequestError()), (0, "ok")],
+        policy=RequestPolicy(hedge_after=0.05, backoff_base=0))
+    assert request(target, hedge=True) == "ok"
+    record = target.get_last_request_record()
+    assert target.sent == 3
+    assert (record.attempts, record.winner, record.hedged) == (3, 3, False)
+
+def test_hedge_wins():
+    target = FakeLambdaTarget([(0.5, "slow"), (0, "fast")], policy=RequestPolicy(hedge_after=0.05))
+    assert request(target, hedge=True) == "fast"
+    record = target.get_last_request_record()
+    assert (record.attempts, record.winner, record.hedged) == (2, 2, True)
+
+def client_error(code, status):
+    import botocore.exceptions
+    return botocore.exceptions.ClientError(
+        {"Error": {"Code": code, "Message": "error"}, "ResponseMetadata": {"HTTPStatusCode": status}}, "Invoke")
+
+class ErrorClient:
+    def __init__(self, errors):
+        self.errors = list(errors)
+
+    def invoke(self, **kwargs):
+        raise self.errors.pop(0)
+
+@pytest.mark.parametrize("error, expected", [
+    (client_error("ServiceException", 500), TransientRequestError),
+    (client_error("TooManyRequestsException", 429), ThrottlingError),
+    (client_error("ResourceNotFoundException", 404), RequestError),
+])
+def test_client_errors(error, expected):
+    target = LambdaTarget(session=None, function_arn=ARN)
+    with pytest.raises(expected) as info:
+        target._invoke_function(b"{}", ErrorClient([error]))
+    assert type(info.value) is expected
+
+def test_server_errors_are_retried():
+    client = ErrorClient([client_error("ServiceException", 500), client_error("ResourceNotFoundException", 404)])
+    target = LambdaTarget(session=None, function_arn=ARN, lambda_client=client,
+        policy=RequestPolicy(backoff_base=0))
+    with pytest.raises(RequestError, match="ResourceNotFound"):
+        target._request_schema(SchemaRequest(client="test"))
+    assert not client.errors
+
+def test_configured_region(tmp_path, monkeypatch):
+    from api_concierge_cli.aws.awslambda import LambdaPlatform
+    config = tmp_path / "config"
+    config.write_text("[default]\nregion = us-west-2\n[profile other]\nregion = eu-west-1\n")
+    monkeypatch.setenv("AWS_CONFIG_FILE", str(config))
+    for name in ["AWS_REGION", "AWS_DEFAULT_REGION", "AWS_PROFILE"]:
+        monkeypatch.delenv(name, raising=False)
+    assert LambdaPlatform._get_configured_region(None) == "us-west-2"
+    assert LambdaPlatform._get_configured_region("other") == "eu-west-1"
+    assert LambdaPlatform._get_configured_region("missing") is None
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "ap-south-1")
+    assert LambdaPlatform._get_configured_region("other") == "ap-south-1"
+    assert LambdaPlatform._get_cache_key("other", "eu-west-1") != LambdaPlatform._get_cache_key("other", "us-west-2")
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_shared_transport_closed_by_last_target():
+    import asyncio
+    from api_concierge_cli.aws.awslambda_async import AsyncLambdaTarget, AsyncLambdaTransport
+    transport = AsyncLambdaTransport(None, "https://lambda.us-east-1.amazonaws.com", "us-east-1")
+    targets = [AsyncLambdaTarget(FakeLambdaTarget([]), transport) for _ in range(2)]
+    connection = FakeConnection()
+    transport._idle.append(connection)
+    asyncio.run(targets[0].aclose())
+    asyncio.run(targets[0].aclose())
+    assert not connection.closed
+    asyncio.run(targets[1].aclose())
+    assert connection.closed
+
+def test_connections_from_previous_loop_are_closed():
+    import asyncio
+    from api_concierge_cli.aws.awslambda_async import AsyncLambdaTransport
+    transport = AsyncLambdaTransport(None, "https://lambda.us-east-1.amazonaws.com", "us-east-1")
+    async def bind():
+        transport._bind_loop()
+    asyncio.run(bind())
+    connection = FakeConnection()
+    transport._idle.append(connection)
+    asyncio.run(bind())
+    assert connection.closed
+    assert not transport._idle
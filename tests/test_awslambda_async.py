@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+import pytest
+
+from api_concierge_cli.aws.awslambda import LambdaTarget
+from api_concierge_cli.aws.awslambda_async import AsyncLambdaTarget, AsyncLambdaTransport
+from api_concierge_cli.platform import RequestError, RequestPolicy, ThrottlingError, TransientRequestError
+from api_concierge_cli.types import SchemaRequest
+
+ARN = "arn:aws:lambda:us-east-1:123456789012:function:test"
+
+class FakeSession:
+    def __init__(self):
+        self.resolved = 0
+
+    def get_credentials(self):
+        from botocore.credentials import Credentials
+        self.resolved += 1
+        return Credentials("AKID", "secret")
+
+def response(status=200, body=b"{}", headers=(), chunked=False):
+    lines = [f"HTTP/1.1 {status} Status"] + [f"{name}: {value}" for name, value in headers]
+    if chunked:
+        lines.append("Transfer-Encoding: chunked")
+        middle = len(body) // 2
+        chunks = [body[:middle], body[middle:]]
+        data = b"".join(b"%x\r\n%s\r\n" % (len(chunk), chunk) for chunk in chunks if chunk) + b"0\r\n\r\n"
+    else:
+        lines.append(f"Content-Length: {len(body)}")
+        data = body
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data
+
+class Server:
+    """Answers requests from a script of responses, one per request, and
+    closes the connection after responses marked with close_after."""
+    def __init__(self, script):
+        self.script = list(script)
+        self.connections = 0
+        self.requests = []
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while self.script:
+                head = await reader.readuntil(b"\r\n\r\n")
+                headers = dict(
+                    line.split(": ", 1) for line in head.decode("latin-1").split("\r\n")[1:] if line
+                )
+                body = await reader.readexactly(int(headers["Content-Length"]))
+                self.requests.append((head.split(b" ")[1].decode(), headers, body))
+                data, close_after = self.script.pop(0)
+                writer.write(data)
+                await writer.drain()
+                if close_after:
+                    break
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+def run(script, func):
+    """Runs func(transport, server) against a local server answering from script."""
+    server = Server(script)
+    session = FakeSession()
+    async def main():
+        tcp_server = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = tcp_server.sockets[0].getsockname()[1]
+        transport = AsyncLambdaTransport(session, f"http://127.0.0.1:{port}", "us-east-1")
+        transport.open()
+        try:
+            return await func(transport, server)
+        finally:
+            await transport.aclose()
+            tcp_server.close()
+            await tcp_server.wait_closed()
+    return asyncio.run(main()), server, session
+
+async def invoke(transport, payload=b"{}"):
+    return await transport.invoke("test", payload, connect_timeout=1, read_timeout=1)
+
+def test_request_is_signed():
+    async def func(transport, server):
+        return await invoke(transport, b'{"a": 1}')
+    (headers, payload), server, _ = run([(response(body=b'{"ok": true}'), False)], func)
+    assert payload == {"ok": True}
+    path, request_headers, body = server.requests[0]
+    assert path == "/2015-03-31/functions/test/invocations"
+    assert request_headers["Authorization"].startswith("AWS4-HMAC-SHA256 Credential=AKID/")
+    assert body == b'{"a": 1}'
+
+def test_chunked_response():
+    body = json.dumps({"items": list(range(100))}).encode()
+    async def func(transport, server):
+        return await invoke(transport)
+    (_, payload), _, _ = run([(response(body=body, chunked=True), False)], func)
+    assert payload == {"items": list(range(100))}
+
+def test_connections_are_reused():
+    async def func(transport, server):
+        for _ in range(3):
+            await invoke(transport)
+    _, server, session = run([(response(), False)] * 3, func)
+    assert server.connections == 1
+    assert len(server.requests) == 3
+    # credentials are resolved once, not on every request
+    assert session.resolved == 1
+
+def test_connection_close_is_honored():
+    async def func(transport, server):
+        await invoke(transport)
+        await invoke(transport)
+    _, server, _ = run([(response(headers=[("Connection", "close")]), True), (response(), False)], func)
+    assert server.connections == 2
+
+def test_idle_connection_closed_by_server_is_retried():
+    async def func(transport, server):
+        await invoke(transport)
+        # let the transport see the server close the idle connection
+        await asyncio.sleep(0.05)
+        return await invoke(transport)
+    (_, payload), server, _ = run([(response(), True), (response(body=b"[1]"), False)], func)
+    assert payload == [1]
+    assert server.connections == 2
+    assert len(server.requests) == 2
+
+@pytest.mark.parametrize("status, headers, body, expected, message", [
+    (502, [("Content-Type", "text/html")], b"<html>Bad Gateway</html>", TransientRequestError, "(502)"),
+    (500, [("X-Amzn-ErrorType", "ServiceException")], b'{"Message": "oops"}', TransientRequestError,
+        "(ServiceException) when calling the Invoke operation: oops"),
+    (429, [], b'{"Type": "User", "message": "Rate exceeded"}', ThrottlingError, "Rate exceeded"),
+    (404, [("X-Amzn-ErrorType", "ResourceNotFoundException:http://internal")], b"{}", RequestError,
+        "(ResourceNotFoundException)"),
+])
+def test_error_responses(status, headers, body, expected, message):
+    async def func(transport, server):
+        with pytest.raises(expected) as info:
+            await invoke(transport)
+        return info.value
+    error, _, _ = run([(response(status, body, headers), False)], func)
+    assert type(error) is expected
+    assert message in str(error)
+
+def test_target_retries_server_errors_and_reports_function_errors():
+    function_error = response(
+        body=b'{"errorType": "ValueError", "errorMessage": "bad"}', headers=[("X-Amz-Function-Error", "Unhandled")])
+    async def func(transport, server):
+        target = AsyncLambdaTarget(
+            LambdaTarget(session=None, function_arn=ARN, policy=RequestPolicy(backoff_base=0)), transport)
+        with pytest.raises(RequestError, match="Error Unhandled ValueError: bad"):
+            await target.request_schema(SchemaRequest(client="test"))
+        await target.aclose()
+    _, server, _ = run([(response(502, b"<html></html>"), False), (function_error, False)], func)
+    assert len(server.requests) == 2
@@ -0,0 +1,128 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from api_concierge_cli import cache
+from api_concierge_cli.completion import complete_from_cache
+from api_concierge_cli.local import LocalTarget
+
+TARGETS = [LocalTarget(handler="my-func", description="first"), LocalTarget(handler="my:other"), LocalTarget(handler="x")]
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(cache.CACHE_DIR_ENV_VAR, str(tmp_path))
+    for name in ["AWS_REGION", "AWS_PROFILE"]:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    return tmp_path
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(subprocess, "Popen", lambda args, **kwargs: calls.append(args[3:]))
+    return calls
+
+def test_concurrent_writes_to_one_path(tmp_path):
+    path = str(tmp_path / "schemas" / "hash.json")
+    barrier = threading.Barrier(8)
+    errors = []
+    def write(i):
+        barrier.wait()
+        try:
+            for _ in range(5):
+                cache.write_file(path, str(i).encode() * 1000000)
+        except OSError as e:
+            errors.append(e)
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path / "schemas") == ["hash.json"]
+    with open(path, "rb") as fp:
+        assert len(set(fp.read())) == 1
+
+def test_caching_targets_writes_after_all_are_seen(cache_dir):
+    targets = cache.caching_targets("local", "key", iter(TARGETS))
+    assert next(targets) is TARGETS[0]
+    assert cache.read_targets("local", "key") is None
+    assert list(targets) == TARGETS[1:]
+    assert cache.read_targets("local", "key") == [
+        {"name": "my-func", "description": "first"},
+        {"name": "my:other", "description": None},
+        {"name": "x", "description": None},
+    ]
+
+def test_target_completer(cache_dir, refreshes):
+    cache.write_targets("lambda", "key", TARGETS)
+    complete = cache.get_target_completer("lambda", lambda ctx: "key", lambda ctx: ["--profile", "p"])
+    items = complete(None, None, "my")
+    assert [(item.value, item.help) for item in items] == [("my-func", "first"), ("my:other", None)]
+    assert refreshes == []
+
+def test_stale_cache_is_refreshed_once(cache_dir, refreshes):
+    complete = cache.get_target_completer("lambda", lambda ctx: "key", lambda ctx: ["--profile", "p"])
+    assert complete(None, None, "") == []
+    assert complete(None, None, "") == []
+    assert refreshes == [["lambda", "list", "--profile", "p"]]
+
+@pytest.mark.parametrize("instruction, words, cword, expected", [
+    ("bash_complete", "api-concierge lambda invoke my", "3", "plain,my-func\nplain,my:other\n"),
+    ("bash_complete", "api-concierge lambda get-schema --profile p ", "5", "plain,x\n"),
+    ("zsh_complete", "api-concierge lambda invoke ", "3", "plain\nmy-func\nfirst\nplain\nmy:other\n_\nplain\nx\n_\n"),
+    ("fish_complete", "api-concierge lambda invoke my-", "my-", "plain,my-func\tfirst\n"),
+    ("bash_complete", "api-concierge lambda invoke z", "3", "\n"),
+])
+def test_complete_from_cache(cache_dir, refreshes, monkeypatch, capsys, instruction, words, cword, expected):
+    cache.write_targets("lambda", "default-us-east-1", TARGETS)
+    cache.write_targets("lambda", "p-us-east-1", TARGETS[2:])
+    monkeypatch.setenv("_API_CONCIERGE_COMPLETE", instruction)
+    monkeypatch.setenv("COMP_WORDS", words)
+    monkeypatch.setenv("COMP_CWORD", cword)
+    assert complete_from_cache()
+    assert capsys.readouterr().out == expected
+
+@pytest.mark.parametrize("words, cword", [
+    ("api-concierge ", "1"),
+    ("api-concierge lambda list ", "3"),
+    ("api-concierge local invoke ", "3"),
+    ("api-concierge lambda invoke --", "3"),
+    ("api-concierge lambda invoke --profile ", "4"),
+    ("api-concierge lambda invoke --show-event ", "4"),
+])
+def test_other_completions_are_left_to_click(cache_dir, monkeypatch, capsys, words, cword):
+    monkeypatch.setenv("_API_CONCIERGE_COMPLETE", "bash_complete")
+    monkeypatch.setenv("COMP_WORDS", words)
+    monkeypatch.setenv("COMP_CWORD", cword)
+    assert not complete_from_cache()
+    assert capsys.readouterr().out == ""
+
+def test_completion_matches_click(cache_dir, refreshes, monkeypatch, capsys):
+    pytest.importorskip("jsonschema_prompt")
+    from api_concierge_cli.cli import cli
+    from api_concierge_cli.completion import COMPLETE_VAR
+    cache.write_targets("lambda", "default-us-east-1", TARGETS)
+    for instruction in ["bash_complete", "zsh_complete", "fish_complete"]:
+        monkeypatch.setenv(COMPLETE_VAR, instruction)
+        monkeypatch.setenv("COMP_WORDS", "api-concierge lambda invoke my")
+        monkeypatch.setenv("COMP_CWORD", "my" if instruction == "fish_complete" else "3")
+        assert complete_from_cache()
+        fast = capsys.readouterr().out
+        with pytest.raises(SystemExit):
+            cli(prog_name="api-concierge", complete_var=COMPLETE_VAR)
+        assert capsys.readouterr().out == fast
+
+def test_completion_does_not_load_the_cli(cache_dir):
+    cache.write_targets("lambda", "default-us-east-1", TARGETS)
+    env = dict(os.environ, _API_CONCIERGE_COMPLETE="bash_complete", COMP_WORDS="api-concierge lambda invoke x",
+        COMP_CWORD="3")
+    code = "import sys; from api_concierge_cli.__main__ import main; main(); print(sorted(sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+    completions, modules = output.splitlines()
+    assert completions == "plain,x"
+    for module in ["click", "typing", "api_concierge_cli.cli", "api_concierge_cli.codec"]:
+        assert f"'{module}'" not in modules
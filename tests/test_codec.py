@@ -0,0 +1,61 @@
+import dataclasses
+import datetime
+import json
+import math
+
+import pytest
+
+from api_concierge_cli import codec
+
+def test_round_trip():
+    value = {"a": [1, 2.5, "x", None, True], "b": {"c": "é"}}
+    assert codec.loads(codec.dumps_bytes(value)) == value
+    assert codec.loads(codec.dumps(value, indent=True)) == value
+
+def test_big_integers_keep_precision():
+    value = 123456789012345678901234567890
+    assert codec.loads(b"123456789012345678901234567890") == value
+    assert codec.loads('{"a": [-123456789012345678901234567890]}') == {"a": [-value]}
+    assert codec.loads(codec.dumps_bytes({"a": value})) == {"a": value}
+
+def test_nan_and_infinity():
+    value = codec.loads(b'{"a": NaN, "b": Infinity, "c": -Infinity}')
+    assert math.isnan(value["a"])
+    assert value["b"] == math.inf
+    assert value["c"] == -math.inf
+
+def test_invalid_json():
+    with pytest.raises(codec.JSONDecodeError):
+        codec.loads(b"{")
+    with pytest.raises(ValueError):
+        codec.loads("nope")
+
+@pytest.mark.parametrize("use_marshal", [True, False])
+def test_non_finite_floats_encode_like_stdlib(use_marshal, monkeypatch):
+    monkeypatch.setattr(codec, "_USE_MARSHAL", use_marshal and codec._USE_MARSHAL)
+    value = {"a": [1.5, None, math.nan], "b": math.inf, "c": (-math.inf,)}
+    assert codec.dumps_bytes(value) == json.dumps(value, separators=(",", ":")).encode("utf-8")
+    assert codec.dumps(value) == json.dumps(value)
+    assert codec.dumps_bytes({"a": None, "b": 1.5}) == b'{"a":null,"b":1.5}'
+
+@dataclasses.dataclass
+class Point:
+    x: int
+
+@pytest.mark.parametrize("value", [datetime.datetime(2020, 1, 1), Point(1), {"a": [datetime.date(2020, 1, 1)]}])
+def test_non_json_types_are_rejected(value):
+    with pytest.raises(TypeError):
+        codec.dumps_bytes(value)
+    with pytest.raises(TypeError):
+        codec.dumps(value, indent=True)
+
+def test_long_digit_strings():
+    assert codec.loads(b'{"id": "12345678901234567890", "n": 1}') == {"id": "12345678901234567890", "n": 1}
+    assert codec.loads('{"n": 12345678901234567890}') == {"n": 12345678901234567890}
+
+def test_non_finite_floats_next_to_values_marshal_rejects():
+    import uuid
+    # marshal can't encode the UUID, so the NaN is found by walking, and
+    # stdlib then rejects the UUID
+    with pytest.raises(TypeError):
+        codec.dumps_bytes({"id": uuid.UUID(int=1), "a": math.nan})
@@ -0,0 +1,80 @@
+import datetime
+import os
+import stat
+
+import pytest
+
+from api_concierge_cli.aws.credential_cache import CredentialCache
+
+def entry(expires_in):
+    expiration = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=expires_in)
+    return {"Credentials": {"AccessKeyId": "AKID", "SecretAccessKey": "secret",
+        "SessionToken": "token", "Expiration": expiration}}
+
+def test_valid_entry_is_returned(tmp_path):
+    cache = CredentialCache(str(tmp_path / "credentials"))
+    cache["key"] = entry(3600)
+    assert "key" in cache
+    assert cache["key"]["Credentials"]["AccessKeyId"] == "AKID"
+
+def test_expired_entry_is_removed(tmp_path):
+    cache = CredentialCache(str(tmp_path / "credentials"))
+    cache["key"] = entry(-60)
+    assert "key" not in cache
+    assert os.listdir(cache.directory) == []
+
+def test_entries_without_expiration_are_expired(tmp_path):
+    cache = CredentialCache(str(tmp_path / "credentials"))
+    cache["key"] = {"Credentials": {"AccessKeyId": "AKID"}}
+    with pytest.raises(KeyError):
+        cache["key"]
+
+def test_keys_stay_in_directory(tmp_path):
+    cache = CredentialCache(str(tmp_path / "credentials"))
+    cache["../key"] = entry(3600)
+    assert os.listdir(tmp_path) == ["credentials"]
+    assert cache["../key"]
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_only_readable_by_user(tmp_path):
+    cache = CredentialCache(str(tmp_path / "credentials"))
+    cache["key"] = entry(3600)
+    assert stat.S_IMODE(os.stat(cache.directory).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(cache._path("key")).st_mode) == 0o600
+
+@pytest.mark.skipif(os.name != "posix" or os.geteuid() == 0, reason="POSIX permissions, not as root")
+def test_unwritable_directory(tmp_path):
+    directory = tmp_path / "credentials"
+    directory.mkdir(mode=0o500)
+    cache = CredentialCache(str(directory))
+    try:
+        cache["key"] = entry(3600)
+    finally:
+        directory.chmod(0o700)
+    assert "key" not in cache
+    assert os.listdir(directory) == []
+
+def test_write_error_removes_temporary_file(tmp_path, monkeypatch):
+    cache = CredentialCache(str(tmp_path / "credentials"))
+    def replace(src, dst):
+        raise OSError("read-only")
+    monkeypatch.setattr(os, "replace", replace)
+    cache["key"] = entry(3600)
+    assert os.listdir(cache.directory) == []
+
+def test_round_trip_through_botocore(tmp_path):
+    from botocore.credentials import AssumeRoleCredentialFetcher, Credentials
+    cache = CredentialCache(str(tmp_path / "credentials"))
+    calls = []
+    class Client:
+        def assume_role(self, **kwargs):
+            calls.append(kwargs)
+            return entry(3600)
+    def fetcher():
+        return AssumeRoleCredentialFetcher(
+            client_creator=lambda *args, **kwargs: Client(), source_credentials=Credentials("source", "secret"),
+            role_arn="arn:aws:iam::123456789012:role/test", cache=cache)
+    assert fetcher().fetch_credentials()["access_key"] == "AKID"
+    # a new fetcher, as in the next run of the CLI, reads the file instead
+    assert fetcher().fetch_credentials()["token"] == "token"
+    assert len(calls) == 1
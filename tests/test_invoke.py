@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip("jsonschema_prompt")
+
+from api_concierge_cli.invoke import _build_from_set_values, _get_complete_value, invoke_handler
+from api_concierge_cli.platform import Target
+from api_concierge_cli.types import SchemaResponse
+
+def test_build_nested_objects():
+    assert _build_from_set_values({"/a/b": 1, "/a/c": "x", "/d": None}) == {"a": {"b": 1, "c": "x"}, "d": None}
+
+def test_build_arrays():
+    assert _build_from_set_values({"/a/0": 1, "/a/1": 2}) == {"a": [1, 2]}
+    assert _build_from_set_values({"/a/-": 1}) == {"a": [1]}
+    assert _build_from_set_values({"/a/0/b": True}) == {"a": [{"b": True}]}
+
+def test_build_whole_document():
+    assert _build_from_set_values({"": [1, 2]}) == [1, 2]
+    # longer pointers apply on top of the whole document, whatever order they're given in
+    assert _build_from_set_values({"/b": 2, "": {"a": 1}}) == {"a": 1, "b": 2}
+
+def test_build_escaped_parts():
+    assert _build_from_set_values({"/a~1b/c~0d": 1}) == {"a/b": {"c~d": 1}}
+
+def test_build_empty():
+    assert _build_from_set_values({}) == {}
+
+def test_build_errors():
+    with pytest.raises(ValueError):
+        _build_from_set_values({"/a/2": 1})
+    with pytest.raises(ValueError):
+        _build_from_set_values({"/a": 1, "/a/b": 2})
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"name": {"type": "string"}, "count": {"type": "integer"}},
+    "required": ["name"],
+}
+
+def test_complete_value():
+    assert _get_complete_value(SCHEMA, {"/name": "bob"}) == ({"name": "bob"}, None)
+
+def test_incomplete_value():
+    value, error = _get_complete_value(SCHEMA, {"/count": 1})
+    assert value is None
+    assert "name" in error
+
+def test_invalid_value():
+    value, error = _get_complete_value(SCHEMA, {"/name": "bob", "/count": "x"})
+    assert value is None
+    assert error.startswith("/count:")
+
+@pytest.mark.parametrize("schema", [
+    {"type": "foo"},
+    {"$ref": "#/definitions/missing"},
+    {"type": "object", "properties": {"a": {"$ref": "#/$defs/missing"}}},
+])
+def test_broken_schema(schema):
+    value, error = _get_complete_value(schema, {"/a": 1})
+    assert value is None
+    assert error.startswith("invalid schema:")
+
+class MultiStepTarget(Target):
+    """Asks for a name, then asks for confirmation."""
+    def __init__(self):
+        self.invocations = []
+
+    def request_schema(self, request):
+        return SchemaResponse(schema=SCHEMA)
+
+    def invoke(self, request):
+        self.invocations.append(request.payload)
+        if len(self.invocations) == 1:
+            return SchemaResponse(schema={"type": "object", "properties": {"confirm": {"type": "boolean"}}})
+        return {"done": True}
+
+def test_set_values_only_apply_to_first_step(capsys):
+    target = MultiStepTarget()
+    with pytest.raises(SystemExit) as exc_info:
+        invoke_handler(None, target, {"set": {"/name": "bob"}, "no_input": True})
+    assert exc_info.value.code == 1
+    assert target.invocations == [{"name": "bob"}]
+    assert "the service requested more input" in capsys.readouterr().err
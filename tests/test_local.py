@@ -0,0 +1,53 @@
+import json
+import sys
+
+import pytest
+
+from api_concierge_cli.local import LocalTarget
+from api_concierge_cli.platform import RequestError
+from api_concierge_cli.types import SchemaRequest
+
+HANDLERS = '''
+import json
+import sys
+
+def schema(event, context):
+    print(json.dumps(event))
+    return {"x-api-concierge-response": "schema", "x-api-concierge-schema": {"type": "object"}}
+
+def exits(event, context):
+    sys.exit(3)
+
+def crashes(event, context):
+    import os
+    os._exit(1)
+'''
+
+@pytest.fixture
+def handlers(tmp_path, monkeypatch):
+    (tmp_path / "local_test_handlers.py").write_text(HANDLERS)
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    return str(tmp_path)
+
+def test_handler_output_goes_to_stderr(handlers, capsys):
+    target = LocalTarget(handler="local_test_handlers:schema", paths=[handlers])
+    response = target.request_schema(SchemaRequest(client="test"))
+    print("cli output")
+    assert response.schema == {"type": "object"}
+    captured = capsys.readouterr()
+    assert captured.out == "cli output\n"
+    assert json.loads(captured.err)["x-api-concierge-request"] == "schema"
+
+def test_system_exit_is_a_function_error(handlers):
+    target = LocalTarget(handler="local_test_handlers:exits", paths=[handlers])
+    with pytest.raises(RequestError, match="SystemExit"):
+        target.request_schema(SchemaRequest(client="test"))
+
+def test_crashed_worker_is_a_request_error(handlers):
+    from api_concierge_cli import local
+    target = LocalTarget(handler="local_test_handlers:crashes", paths=[handlers], isolate=True)
+    with pytest.raises(RequestError, match="worker process exited"):
+        target.request_schema(SchemaRequest(client="test"))
+    assert local._POOL is None
+    target = LocalTarget(handler="local_test_handlers:schema", paths=[handlers], isolate=True)
+    assert target.request_schema(SchemaRequest(client="test")).schema == {"type": "object"}
@@ -0,0 +1,88 @@
+from api_concierge_cli.preprocess import dereference, preprocess_schema
+
+def test_inlines_refs_and_drops_definitions():
+    schema = {
+        "type": "object",
+        "properties": {"a": {"$ref": "#/definitions/A"}},
+        "definitions": {"A": {"type": "string"}, "Unused": {"type": "integer"}},
+    }
+    assert dereference(schema) == {"type": "object", "properties": {"a": {"type": "string"}}}
+
+def test_chained_refs():
+    schema = {
+        "$ref": "#/$defs/A",
+        "$defs": {"A": {"$ref": "#/$defs/B"}, "B": {"type": "boolean"}},
+    }
+    assert dereference(schema) == {"type": "boolean"}
+
+def test_property_named_like_a_data_keyword():
+    schema = {
+        "type": "object",
+        "properties": {
+            "default": {"$ref": "#/definitions/X"},
+            "enum": {"$ref": "#/definitions/X"},
+        },
+        "definitions": {"X": {"type": "string"}},
+    }
+    assert dereference(schema)["properties"] == {"default": {"type": "string"}, "enum": {"type": "string"}}
+
+def test_data_keywords_are_not_dereferenced():
+    schema = {
+        "type": "object",
+        "default": {"$ref": "#/definitions/X"},
+        "enum": [{"$ref": "#/definitions/X"}],
+        "definitions": {"X": {"type": "string"}},
+    }
+    output = dereference(schema)
+    assert output["default"] == {"$ref": "#/definitions/X"}
+    assert output["enum"] == [{"$ref": "#/definitions/X"}]
+
+def test_cycles_keep_their_definitions():
+    node = {
+        "type": "object",
+        "properties": {"children": {"type": "array", "items": {"$ref": "#/definitions/Node"}}},
+    }
+    schema = {"$ref": "#/definitions/Node", "definitions": {"Node": node, "Unused": {}}}
+    output = dereference(schema)
+    assert output["properties"]["children"]["items"] == {"$ref": "#/definitions/Node"}
+    assert output["definitions"] == {"Node": node}
+
+def test_legacy_siblings_keep_annotations_only():
+    schema = {
+        "properties": {"a": {"$ref": "#/definitions/A", "description": "an a", "minLength": 3}},
+        "definitions": {"A": {"type": "string"}},
+    }
+    assert dereference(schema)["properties"]["a"] == {"type": "string", "description": "an a"}
+
+def test_siblings_apply_after_draft_07():
+    schema = {
+        "$schema": "https://json-schema.org/draft/2020-12/schema",
+        "properties": {"a": {"$ref": "#/$defs/A", "description": "an a", "minLength": 3}},
+        "$defs": {"A": {"type": "string"}},
+    }
+    assert dereference(schema)["properties"]["a"] == {
+        "minLength": 3,
+        "allOf": [{"type": "string"}],
+        "description": "an a",
+    }
+
+def test_nested_ids_are_left_alone():
+    schema = {
+        "properties": {"a": {"$id": "https://example.com/a", "$ref": "#/definitions/A"}},
+        "definitions": {"A": {"type": "string"}},
+    }
+    assert dereference(schema) is schema
+
+def test_property_named_id_is_not_a_nested_id():
+    schema = {
+        "properties": {"$id": {"type": "string"}, "a": {"$ref": "#/definitions/A"}},
+        "definitions": {"A": {"type": "string"}},
+    }
+    assert dereference(schema)["properties"]["a"] == {"type": "string"}
+
+def test_preprocess_is_memoized_by_content(tmp_path, monkeypatch):
+    monkeypatch.setenv("API_CONCIERGE_CACHE_DIR", str(tmp_path))
+    schema_a = {"properties": {"a": {"$ref": "#/definitions/A"}}, "definitions": {"A": {"type": "string"}}}
+    schema_b = {"properties": {"a": {"$ref": "#/definitions/A"}}, "definitions": {"A": {"type": "integer"}}}
+    assert preprocess_schema(schema_a)["properties"]["a"] == {"type": "string"}
+    assert preprocess_schema(schema_b)["properties"]["a"] == {"type": "integer"}
@@ -0,0 +1,15 @@
+from api_concierge_cli import profiling
+
+def test_session_peak_survives_phases(capsys):
+    stop = profiling.start_memory_profile()
+    data = bytearray(10 * 1024 * 1024)
+    del data
+    with profiling.phase("prompt"):
+        [0] * 1000
+    stop()
+    err = capsys.readouterr().err
+    assert "Peak traced memory: 10.0MiB" in err
+    assert "prompt:" in err
+
+def test_phase_is_noop_when_disabled():
+    assert profiling.phase("a") is profiling.phase("b")
@@ -0,0 +1,64 @@
+from api_concierge_cli.schema_store import SchemaStore, MAX_KNOWN_HASHES
+from api_concierge_cli.types import SchemaRequest, SchemaResponse, get_schema_hash
+
+SCHEMA_A = {"type": "object", "properties": {"a": {"type": "string"}}}
+SCHEMA_B = {"type": "object", "properties": {"b": {"type": "integer"}}}
+
+def not_modified(schema_hash):
+    return SchemaResponse(schema=None, schema_hash=schema_hash)
+
+def test_full_response_is_stored(tmp_path):
+    store = SchemaStore(str(tmp_path))
+    response = store.resolve("t1", SchemaResponse(schema=SCHEMA_A))
+    assert response.schema_hash == get_schema_hash(SCHEMA_A)
+    assert store.get_known_hashes("t1") == [get_schema_hash(SCHEMA_A)]
+    assert store.resolve("t1", not_modified(response.schema_hash)).schema == SCHEMA_A
+
+def test_service_hash_is_kept(tmp_path):
+    store = SchemaStore(str(tmp_path))
+    response = store.resolve("t1", SchemaResponse(schema=SCHEMA_A, schema_hash="v1"))
+    assert response.schema_hash == "v1"
+    assert store.get_known_hashes("t1") == ["v1"]
+    assert store.resolve("t1", not_modified("v1")).schema == SCHEMA_A
+
+def test_service_hashes_are_per_target(tmp_path):
+    store = SchemaStore(str(tmp_path))
+    store.resolve("t1", SchemaResponse(schema=SCHEMA_A, schema_hash="v1"))
+    store.resolve("t2", SchemaResponse(schema=SCHEMA_B, schema_hash="v1"))
+    assert store.resolve("t1", not_modified("v1")).schema == SCHEMA_A
+    assert store.resolve("t2", not_modified("v1")).schema == SCHEMA_B
+
+def test_unknown_hash(tmp_path):
+    store = SchemaStore(str(tmp_path))
+    assert store.resolve("t1", not_modified("v1")) is None
+    store.resolve("t2", SchemaResponse(schema=SCHEMA_A, schema_hash="v1"))
+    # another target's hash doesn't count
+    assert store.resolve("t1", not_modified("v1")) is None
+
+def test_known_hashes_most_recent_first(tmp_path):
+    store = SchemaStore(str(tmp_path))
+    for i in range(MAX_KNOWN_HASHES + 2):
+        store.resolve("t1", SchemaResponse(schema={"title": str(i)}, schema_hash=f"v{i}"))
+    store.resolve("t1", SchemaResponse(schema={"title": "2"}, schema_hash="v2"))
+    hashes = store.get_known_hashes("t1")
+    assert len(hashes) == MAX_KNOWN_HASHES
+    assert hashes[:2] == ["v2", f"v{MAX_KNOWN_HASHES + 1}"]
+
+def test_shared_schemas_stored_once(tmp_path):
+    store = SchemaStore(str(tmp_path))
+    store.resolve("t1", SchemaResponse(schema=SCHEMA_A, schema_hash="x"))
+    store.resolve("t2", SchemaResponse(schema=SCHEMA_A, schema_hash="y"))
+    assert len(list((tmp_path / "objects").iterdir())) == 1
+
+def test_request_without_hashes_when_schema_is_gone(tmp_path):
+    store = SchemaStore(str(tmp_path))
+    store.resolve("t1", SchemaResponse(schema=SCHEMA_A, schema_hash="v1"))
+    for path in (tmp_path / "objects").iterdir():
+        path.unlink()
+    requests = []
+    def send(request):
+        requests.append(request.schema_hashes)
+        return not_modified("v1") if request.schema_hashes else SchemaResponse(schema=SCHEMA_A, schema_hash="v1")
+    response = store.request("t1", SchemaRequest(client="test"), send)
+    assert response.schema == SCHEMA_A
+    assert requests == [("v1",), ()]
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+
+import click
+import pytest
+
+from api_concierge_cli.platform import RequestRecord, Target, ThrottlingError
+from api_concierge_cli.list import list_handler
+from api_concierge_cli.sweep import write_catalog, AdaptiveLimiter, AsyncAdaptiveLimiter, sweep, sweep_async, _sweep_target
+from api_concierge_cli.types import SchemaRequest, SchemaResponse
+
+REQUEST = SchemaRequest(client="test")
+
+class FakeTarget(Target):
+    def __init__(self, name, responses, delay=0):
+        self.name = name
+        self.responses = list(responses)
+        self.delay = delay
+
+    def get_name(self):
+        return self.name
+
+    def get_description(self):
+        return None
+
+    def request_schema(self, request, *, search=False):
+        time.sleep(self.delay)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return SchemaResponse.load_from_payload(response)
+
+def schema_payload(schema):
+    return {"x-api-concierge-response": "schema", "x-api-concierge-schema": schema}
+
+def test_limiter_halves_on_throttle():
+    limiter = AdaptiveLimiter(8)
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    limiter.on_throttle()
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 1
+
+def test_limiter_grows_after_run_of_successes():
+    limiter = AdaptiveLimiter(8)
+    limiter.on_throttle()
+    for _ in range(3):
+        limiter.on_success()
+    assert limiter.limit == 4
+    limiter.on_success()
+    assert limiter.limit == 5
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.limit == 8
+
+def test_limiter_minimum():
+    assert AdaptiveLimiter(0).limit == 1
+
+def test_valid_schema():
+    target = FakeTarget("a", [schema_payload({"type": "object"})])
+    result = _sweep_target(target, REQUEST, AdaptiveLimiter(1))
+    assert result.valid
+    assert result.schema_hash.startswith("sha256:")
+
+def test_invalid_schema():
+    target = FakeTarget("a", [schema_payload({"type": "not-a-type"})])
+    result = _sweep_target(target, REQUEST, AdaptiveLimiter(1))
+    assert not result.valid
+    assert result.error.startswith("Invalid schema")
+
+def test_non_object_responses_are_invalid():
+    targets = [FakeTarget(str(i), [response]) for i, response in enumerate([None, [1, 2], "schema", 1])]
+    targets.append(FakeTarget("ok", [schema_payload(True)]))
+    results = {r.name: r for r in sweep(targets, REQUEST, 2)}
+    assert results["ok"].valid
+    assert [results[str(i)].valid for i in range(4)] == [False] * 4
+
+def test_throttling_is_retried():
+    target = FakeTarget("a", [ThrottlingError("slow down"), schema_payload(True)])
+    limiter = AdaptiveLimiter(4)
+    result = _sweep_target(target, REQUEST, limiter)
+    assert result.valid
+    assert result.throttled == 1
+    assert limiter.limit == 2
+
+def test_latency_excludes_waiting_for_limiter():
+    targets = [FakeTarget(str(i), [schema_payload(True)], delay=0.05) for i in range(4)]
+    results = list(sweep(targets, REQUEST, 1))
+    assert len(results) == 4
+    assert all(r.latency < 0.1 for r in results)
+
+def test_async_latency_excludes_waiting_for_limiter():
+    targets = [FakeTarget(str(i), [schema_payload(True)], delay=0.05) for i in range(4)]
+    results = list(sweep_async(targets, REQUEST, 1))
+    assert len(results) == 4
+    assert all(r.latency < 0.1 for r in results)
+
+def test_async_limiter_waits_for_release():
+    async def run():
+        limiter = AsyncAdaptiveLimiter(1)
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        limiter.release()
+        await asyncio.wait_for(waiting, 1)
+        limiter.on_throttle()
+        assert (limiter.limit, limiter.in_flight) == (1, 1)
+    asyncio.run(run())
+
+def test_async_throttling_is_retried():
+    target = FakeTarget("a", [ThrottlingError("slow down"), schema_payload(True)])
+    [result] = sweep_async([target], REQUEST, 4)
+    assert result.valid
+    assert result.throttled == 1
+
+@pytest.mark.parametrize("option", [{"concurrency": 4}, {"catalog": "out.json"}, {"asyncio": True}])
+def test_sweep_options_require_with_schema(option):
+    with pytest.raises(click.UsageError, match="requires --with-schema"):
+        list_handler([], dict(option))
+
+def test_record_in_result_and_catalog(tmp_path):
+    record = RequestRecord(phase="schema", attempts=2, winner=2, hedged=True, latency=0.01)
+    target = FakeTarget("a", [schema_payload(True)])
+    target.get_last_request_record = lambda: record
+    [result] = sweep([target], REQUEST, 1)
+    assert result.record == record
+    path = tmp_path / "catalog.json"
+    write_catalog(str(path), [result])
+    entry = json.loads(path.read_text())["targets"]["a"]
+    assert (entry["attempts"], entry["winner"], entry["hedged"]) == (2, 2, True)
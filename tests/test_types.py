@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from api_concierge_cli.types import InvocationRequest, SchemaResponse
+
+def test_payload_bytes_splices_metadata():
+    payload = {"name": "bob", "nested": {"a": [1, 2]}}
+    request = InvocationRequest(payload=payload, client="test", state="s")
+    assert json.loads(request.get_payload_bytes()) == request.get_payload()
+    assert payload == {"name": "bob", "nested": {"a": [1, 2]}}
+
+def test_payload_bytes_empty_payload():
+    request = InvocationRequest(payload={}, client="test")
+    assert json.loads(request.get_payload_bytes()) == {
+        "x-api-concierge-request": "invoke",
+        "x-api-concierge-client": "test",
+    }
+
+def test_payload_bytes_payload_overrides_metadata_key():
+    # the metadata wins, as with get_payload, rather than a duplicate key
+    request = InvocationRequest(payload={"x-api-concierge-client": "other"}, client="test")
+    data = request.get_payload_bytes()
+    assert data.count(b"x-api-concierge-client") == 1
+    assert json.loads(data) == request.get_payload()
+
+@pytest.mark.parametrize("payload", [[1, 2], "text", 3, None])
+def test_payload_bytes_non_dict(payload):
+    request = InvocationRequest(payload=payload, client="test")
+    assert json.loads(request.get_payload_bytes()) == payload
+
+@pytest.mark.parametrize("data", [None, [1], "schema"])
+def test_non_object_is_not_a_response(data):
+    assert not SchemaResponse.is_schema_response(data)
+    with pytest.raises(ValueError):
+        SchemaResponse.load_from_payload(data)